@@ -6,6 +6,8 @@ contract CertificateStorage {
     mapping(string => bytes32) private certificateHashes;
     // Mapping to store certificate metadata
     mapping(string => Certificate) private certificateDetails;
+    // Mapping to store Merkle roots of batch-anchored cohorts (BatchID => Root)
+    mapping(string => bytes32) private batchRoots;
 
     // Struct for certificate metadata
     struct Certificate {
@@ -17,6 +19,8 @@ contract CertificateStorage {
 
     // Event for logging certificate storage
     event CertificateStored(string certID, bytes32 hash, string name, string eventName, string date);
+    // Event for logging a batch anchored by its Merkle root
+    event BatchRootStored(string batchID, bytes32 root, uint256 count);
 
     // Store a certificate hash
     function storeCertificate(
@@ -32,6 +36,14 @@ contract CertificateStorage {
         emit CertificateStored(certID, certHash, name, eventName, date);
     }
 
+    // Store the Merkle root of a whole cohort of certificate hashes
+    function storeBatchRoot(string memory batchID, bytes32 root, uint256 count) public {
+        require(batchRoots[batchID] == bytes32(0), "Batch ID already exists");
+        require(root != bytes32(0), "Empty root");
+        batchRoots[batchID] = root;
+        emit BatchRootStored(batchID, root, count);
+    }
+
     // Verify a certificate hash
     function verifyCertificate(string memory certID, bytes32 certHash) public view returns (bool) {
         return certificateHashes[certID] == certHash;
@@ -42,4 +54,9 @@ contract CertificateStorage {
         Certificate memory cert = certificateDetails[certID];
         return (cert.name, cert.eventName, cert.date, cert.hash); // Updated
     }
+
+    // Get the Merkle root of a batch (zero if the batch is unknown)
+    function getBatchRoot(string memory batchID) public view returns (bytes32) {
+        return batchRoots[batchID];
+    }
 }
\ No newline at end of file
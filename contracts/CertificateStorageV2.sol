@@ -0,0 +1,84 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+// Gas-optimized layout: each certificate costs one storage slot, its hash
+// keyed by keccak256(certID). Hashes are never zero, so a zero slot means
+// "not stored". Name, event, date and issue time are emitted in the
+// CertificateStored log and never written to storage.
+contract CertificateStorageV2 {
+    // One hash per certificate (CertKey => Hash)
+    mapping(bytes32 => bytes32) private certificateHashes;
+    // Merkle roots of batch-anchored cohorts (BatchKey => Root)
+    mapping(bytes32 => bytes32) private batchRoots;
+
+    // certKey is indexed so a single certificate's metadata can be fetched by topic
+    event CertificateStored(bytes32 indexed certKey, string certID, bytes32 hash, string name, string eventName, string date, uint256 issuedAt);
+    event BatchRootStored(bytes32 indexed batchKey, string batchID, bytes32 root, uint256 count);
+
+    // Store a certificate hash; same arguments as CertificateStorage.storeCertificate
+    function storeCertificate(
+        string calldata certID,
+        bytes32 certHash,
+        string calldata name,
+        string calldata eventName,
+        string calldata date
+    ) external {
+        bytes32 certKey = keccak256(bytes(certID));
+        require(certificateHashes[certKey] == bytes32(0), "Certificate ID already exists");
+        require(certHash != bytes32(0), "Empty hash");
+        certificateHashes[certKey] = certHash;
+        emit CertificateStored(certKey, certID, certHash, name, eventName, date, block.timestamp);
+    }
+
+    // Store the Merkle root of a whole cohort of certificate hashes
+    function storeBatchRoot(string calldata batchID, bytes32 root, uint256 count) external {
+        bytes32 batchKey = keccak256(bytes(batchID));
+        require(batchRoots[batchKey] == bytes32(0), "Batch ID already exists");
+        require(root != bytes32(0), "Empty root");
+        batchRoots[batchKey] = root;
+        emit BatchRootStored(batchKey, batchID, root, count);
+    }
+
+    // Verify a certificate hash
+    function verifyCertificate(bytes32 certKey, bytes32 certHash) external view returns (bool) {
+        return certHash != bytes32(0) && certificateHashes[certKey] == certHash;
+    }
+
+    // Get the stored hash (zero if the certificate is unknown)
+    function getCertificate(bytes32 certKey) external view returns (bytes32) {
+        return certificateHashes[certKey];
+    }
+
+    // Get the Merkle root of a batch (zero if the batch is unknown)
+    function getBatchRoot(bytes32 batchKey) external view returns (bytes32) {
+        return batchRoots[batchKey];
+    }
+
+    // Verify many certificate hashes in one call
+    function verifyCertificates(bytes32[] calldata certKeys, bytes32[] calldata certHashes) external view returns (bool[] memory) {
+        require(certKeys.length == certHashes.length, "Length mismatch");
+        bool[] memory results = new bool[](certKeys.length);
+        for (uint256 i = 0; i < certKeys.length; i++) {
+            results[i] = certHashes[i] != bytes32(0) && certificateHashes[certKeys[i]] == certHashes[i];
+        }
+        return results;
+    }
+
+    // Get the hashes of many certificates in one call (zero for unknown ones)
+    function getCertificates(bytes32[] calldata certKeys) external view returns (bytes32[] memory) {
+        bytes32[] memory results = new bytes32[](certKeys.length);
+        for (uint256 i = 0; i < certKeys.length; i++) {
+            results[i] = certificateHashes[certKeys[i]];
+        }
+        return results;
+    }
+
+    // Get the Merkle roots of many batches in one call
+    function getBatchRoots(bytes32[] calldata batchKeys) external view returns (bytes32[] memory) {
+        bytes32[] memory results = new bytes32[](batchKeys.length);
+        for (uint256 i = 0; i < batchKeys.length; i++) {
+            results[i] = batchRoots[batchKeys[i]];
+        }
+        return results;
+    }
+}
@@ -0,0 +1,57 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+import "./CertificateStorage.sol";
+
+// Read-only array views over an existing CertificateStorage deployment: each
+// answers a whole list of IDs in one call through the storage contract's own
+// view functions. It holds nothing but that contract's address, so adding it
+// never touches (or redeploys) the anchored certificates.
+contract CertificateStorageViews {
+    CertificateStorage public immutable certificateStorage;
+
+    // Same layout as CertificateStorage.Certificate
+    struct Certificate {
+        string name;
+        string eventName;
+        string date;
+        bytes32 hash;
+    }
+
+    constructor(CertificateStorage storageAddress) {
+        certificateStorage = storageAddress;
+    }
+
+    // Verify many certificate hashes in one call
+    function verifyCertificates(string[] memory certIDs, bytes32[] memory certHashes) public view returns (bool[] memory) {
+        require(certIDs.length == certHashes.length, "Length mismatch");
+        bool[] memory results = new bool[](certIDs.length);
+        for (uint256 i = 0; i < certIDs.length; i++) {
+            results[i] = certificateStorage.verifyCertificate(certIDs[i], certHashes[i]);
+        }
+        return results;
+    }
+
+    // Get details of many certificates in one call (unknown IDs come back empty)
+    function getCertificateDetailsBatch(string[] memory certIDs) public view returns (Certificate[] memory) {
+        Certificate[] memory results = new Certificate[](certIDs.length);
+        for (uint256 i = 0; i < certIDs.length; i++) {
+            (string memory name, string memory eventName, string memory date, bytes32 certHash) =
+                certificateStorage.getCertificateDetails(certIDs[i]);
+            results[i] = Certificate(name, eventName, date, certHash);
+        }
+        return results;
+    }
+
+    // Get the Merkle roots of many batches in one call (unknown batches come
+    // back as zero, as do all of them on a deployment without batch roots)
+    function getBatchRoots(string[] memory batchIDs) public view returns (bytes32[] memory) {
+        bytes32[] memory results = new bytes32[](batchIDs.length);
+        for (uint256 i = 0; i < batchIDs.length; i++) {
+            try certificateStorage.getBatchRoot(batchIDs[i]) returns (bytes32 root) {
+                results[i] = root;
+            } catch {}
+        }
+        return results;
+    }
+}
@@ -1,68 +1,232 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import subprocess
+from functools import lru_cache
+import json
 import sys
 import os
 
+for module_dir in ("jobs", "blockchain", "cert_gen", "email_dist"):
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", module_dir))
+from job_runner import JobRunner
+
 
 app = Flask(__name__)
 CORS(app)  # allow frontend to call the API
 
+# Generation and distribution run here in the background, several at once
+runner = JobRunner(max_workers=int(os.getenv("JOB_WORKERS", "4")))
+
+
+# ----------------------------
+# Verification
+# ----------------------------
+# Lookups hit the local event index first (see indexer.py) and only go to the
+# chain for IDs it does not have. Anchored certificates can never change, so
+# found results are cacheable forever; "not found" may change once a pending
+# anchor confirms, so it is only cached briefly. The blockchain modules are
+# imported on the first lookup, like the job modules below.
+MAX_VERIFY_BATCH = int(os.getenv("MAX_VERIFY_BATCH", "1000"))
+CACHE_FOUND = "public, max-age=31536000, immutable"
+CACHE_NOT_FOUND = "public, max-age=30"
+
+
+@lru_cache(maxsize=None)
+def verification_sources():
+    """(local event index or None, chain reader), set up on first use."""
+    from bulk_verify import ChainReader
+    from indexer import CertificateIndex, INDEX_DB_PATH
+
+    index = CertificateIndex(INDEX_DB_PATH) if os.path.exists(INDEX_DB_PATH) else None
+    return index, ChainReader()
+
+
+def certificate_json(cert_id, record, source):
+    return {"certId": cert_id, "name": record["name"], "event": record["event"],
+            "date": record["date"], "hash": record["hash"], "blockNumber": record.get("block_number"),
+            "txHash": record.get("tx_hash"), "source": source}
 
-# Mock database of certificates
-certificates = {
-    "CERT123": {"name": "Yash Rathod", "course": "Blockchain 101"}
-}
 
+def lookup_certificates(cert_ids):
+    """{cert_id: certificate JSON or None} for every requested ID."""
+    from bulk_verify import lookup_records
+    from verify_cert import lookup_metadata_v2
 
-@app.route("/api/verify", methods=["POST"])
+    records, sources = lookup_records(cert_ids, *verification_sources())
+    # CertificateStorageV2 keeps name/event/date in its event log only: fetch
+    # them for all such records with one log query
+    from_log = [cert_id for cert_id in cert_ids if records.get(cert_id) and records[cert_id]["name"] is None]
+    metadata = lookup_metadata_v2(from_log) if from_log else {}
+    found = {}
+    for cert_id in cert_ids:
+        record = records.get(cert_id)
+        if cert_id in metadata:
+            record = {**record, **metadata[cert_id]}
+        found[cert_id] = certificate_json(cert_id, record, sources[cert_id]) if record else None
+    return found
+
+
+def cacheable(payload, status, found):
+    response = jsonify(payload)
+    response.status_code = status
+    response.headers["Cache-Control"] = CACHE_FOUND if found else CACHE_NOT_FOUND
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def requested_ids():
+    if request.method == "GET":
+        return [i for i in request.args.get("certIds", "").split(",") if i.strip()]
+    return (request.get_json(silent=True) or {}).get("certIds")
+
+
+@app.route("/api/verify", methods=["GET", "POST"])
 def verify_certificate():
-    data = request.json
-    cert_id = data.get("certId")
-    cert = certificates.get(cert_id)
+    if request.method == "GET":
+        cert_id = request.args.get("certId")
+    else:
+        cert_id = (request.get_json(silent=True) or {}).get("certId")
+    if not isinstance(cert_id, str) or not cert_id.strip():
+        return jsonify({"valid": False, "message": "certId is required"}), 400
+
+    cert_id = cert_id.strip()
+    try:
+        cert = lookup_certificates([cert_id])[cert_id]
+    except Exception as e:
+        return jsonify({"valid": False, "message": f"Lookup failed: {e}"}), 503
     if cert:
-        return jsonify({"valid": True, "certificate": cert})
-    return jsonify({"valid": False, "message": "Certificate not found"}), 404
+        return cacheable({"valid": True, "certificate": cert}, 200, True)
+    return cacheable({"valid": False, "message": "Certificate not found"}, 404, False)
+
 
+# Batch variant: POST {"certIds": [...]} or GET ?certIds=a,b,c
+@app.route("/api/verify/batch", methods=["GET", "POST"])
+def verify_certificates():
+    cert_ids = requested_ids()
+    if not isinstance(cert_ids, list) or not all(isinstance(i, str) for i in cert_ids):
+        return jsonify({"success": False, "message": "certIds must be a list of IDs"}), 400
+    cert_ids = list(dict.fromkeys(i.strip() for i in cert_ids))
+    if len(cert_ids) > MAX_VERIFY_BATCH:
+        return jsonify({"success": False,
+                        "message": f"At most {MAX_VERIFY_BATCH} certIds per request"}), 400
 
-# Helper to run a script and return output
-def run_script(script_path):
     try:
-        # Use sys.executable to ensure correct Python
-        result = subprocess.run([sys.executable, script_path], capture_output=True, text=True, check=True)
-        return {"success": True, "output": result.stdout}
-    except subprocess.CalledProcessError as e:
-        return {"success": False, "output": e.stdout + e.stderr}
+        found = lookup_certificates(cert_ids)
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Lookup failed: {e}"}), 503
+    results = [{"certId": cert_id, "valid": found[cert_id] is not None, "certificate": found[cert_id]}
+               for cert_id in cert_ids]
+    valid = sum(1 for r in results if r["valid"])
+    payload = {"success": True, "summary": {"total": len(results), "valid": valid,
+                                            "invalid": len(results) - valid},
+               "results": results}
+    return cacheable(payload, 200, valid == len(results))
+
+
+# ----------------------------
+# Jobs
+# ----------------------------
+# Generation and distribution are imported lazily so the API starts even
+# when the blockchain or email credentials are not configured yet.
+# Generation runs one at a time on its own lane (see JobRunner.submit_serial):
+# it shares the output manifest and an anchoring worker must be the only one
+# using the signing account's nonces
+def generate_certificates_job(batch_id=None, skip_anchor=False):
+    from generate_certs import run
+    result = run(batch_id=batch_id, skip_anchor=skip_anchor)
+    if batch_id:
+        # Per-certificate proofs are written next to the PDFs as .proof.json
+        return {k: result[k] for k in ("batch_id", "root", "tx_hash", "status", "error")}
+    return result
+
+
+def send_certificates_job():
+    from database_setup import create_database
+    from certificate_distributor import CertificateDistributor
+
+    if not os.path.exists('certificates.db'):
+        print("Setting up database...")
+        create_database()
+    distributor = CertificateDistributor()
+    success, result = distributor.email_service.test_connection()
+    if not success:
+        raise RuntimeError(f"Email connection failed: {result}")
+    return distributor.send_all_pending()
+
+
+def start_app(kind, script_path):
+    """The dashboard and portal are separate Flask apps, so they run as child processes."""
+    return runner.start_process(kind, [sys.executable, script_path])
+
+
+def accepted(job):
+    return jsonify({"success": True, "job_id": job.id, "status": job.status,
+                    "status_url": f"/api/jobs/{job.id}",
+                    "events_url": f"/api/jobs/{job.id}/events"}), 202
 
 
 # API endpoint to run Admin Dashboard
 @app.route("/api/run_dashboard", methods=["POST"])
 def run_dashboard():
-    script_path = os.path.join("src", "dashboard", "app.py")
-    result = run_script(script_path)
-    return jsonify(result)
+    return accepted(start_app("dashboard", os.path.join("src", "dashboard", "app.py")))
 
 # API endpoint to run Validation Portal
 @app.route("/api/run_validation_portal", methods=["POST"])
 def run_validation_portal():
-    script_path = os.path.join("src", "validation_portal", "app.py")
-    result = run_script(script_path)
-    return jsonify(result)
+    return accepted(start_app("validation_portal", os.path.join("src", "validation_portal", "app.py")))
 
 # API endpoint to generate certificates
 @app.route("/api/generate_certificates", methods=["POST"])
 def generate_certificates():
-    script_path = os.path.join("src", "cert_gen", "generate_certs.py")
-    result = run_script(script_path)
-    return jsonify(result)
+    options = request.get_json(silent=True) or {}
+    job = runner.submit_serial("generate_certificates", generate_certificates_job,
+                               batch_id=options.get("batchId"),
+                               skip_anchor=bool(options.get("skipAnchor")))
+    return accepted(job)
 
 # API endpoint to send certificates via email
 @app.route("/api/send_certificates", methods=["POST"])
 def send_certificates():
-    script_path = os.path.join("src", "email_dist", "main.py")
-    result = run_script(script_path)
-    return jsonify(result)
+    return accepted(runner.submit("send_certificates", send_certificates_job))
+
+
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify([job.to_dict(since=len(job.lines)) for job in runner.list()])
+
+
+# Poll with ?since=<next from the previous response> to get only new lines
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = runner.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    return jsonify(job.to_dict(since=request.args.get("since", 0, type=int)))
+
+
+# Server-Sent Events: one "log" event per output line, then a final "done"
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    job = runner.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found"}), 404
+    since = request.args.get("since", request.headers.get("Last-Event-ID", 0), type=int)
+
+    def stream(since):
+        while True:
+            if not job.wait(since, timeout=15):
+                yield ": keep-alive\n\n"
+                continue
+            state = job.to_dict(since=since)
+            for line in state["lines"]:
+                since += 1
+                yield f"id: {since}\nevent: log\ndata: {json.dumps(line)}\n\n"
+            if job.done and since >= state["next"]:
+                yield f"event: done\ndata: {json.dumps({k: state[k] for k in ('status', 'result', 'error')})}\n\n"
+                return
+
+    return Response(stream(since), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,12 @@
+const CertificateStorage = artifacts.require("CertificateStorage");
+const CertificateStorageViews = artifacts.require("CertificateStorageViews");
+
+// Deploys the read-only array views (verifyCertificates,
+// getCertificateDetailsBatch, getBatchRoots) next to the existing
+// CertificateStorage, which keeps its address and records. Set
+// CONTRACT_VIEWS_ADDRESS to the new address to use them; without it the
+// Python readers make per-ID calls.
+module.exports = async function (deployer) {
+  const certificateStorage = await CertificateStorage.deployed();
+  await deployer.deploy(CertificateStorageViews, certificateStorage.address);
+};
@@ -0,0 +1,8 @@
+const CertificateStorageV2 = artifacts.require("CertificateStorageV2");
+
+// Deploys the gas-optimized contract alongside the original one. Set
+// CONTRACT_V2_ADDRESS (and CONTRACT_V2_START_BLOCK) to start anchoring to
+// it; CONTRACT_ADDRESS stays set so older certificates still verify.
+module.exports = function (deployer) {
+  deployer.deploy(CertificateStorageV2);
+};
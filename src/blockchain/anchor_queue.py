@@ -0,0 +1,297 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from web3.exceptions import TransactionNotFound
+
+from client import get_web3
+
+# ----------------------------
+# Setup
+# ----------------------------
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+ANCHOR_DB_PATH = os.getenv("ANCHOR_QUEUE_DB", "anchor_queue.db")
+STATUSES = ("queued", "submitted", "confirmed", "failed")
+
+
+# ----------------------------
+# Queue
+# ----------------------------
+class AnchorQueue:
+    """
+    SQLite-backed queue of rendered certificates waiting to be anchored.
+
+    Jobs are keyed by cert_id, so enqueuing the same certificate twice is a
+    no-op. Each job moves queued -> submitted -> confirmed/failed, and the
+    nonce and transaction hash are recorded before the transaction is
+    broadcast, which lets :class:`AnchorWorker` recover after a crash.
+    """
+
+    def __init__(self, db_path: str = ANCHOR_DB_PATH):
+        self.db_path = db_path
+        self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        # WAL lets the renderer keep enqueuing while the worker updates rows
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript('''
+        CREATE TABLE IF NOT EXISTS anchor_jobs (
+            cert_id TEXT PRIMARY KEY,
+            hash TEXT NOT NULL,
+            name TEXT,
+            event TEXT,
+            date TEXT,
+            file_path TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            nonce INTEGER,
+            tx_hash TEXT,
+            block_number INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_anchor_jobs_status ON anchor_jobs (status, created_at);
+        ''')
+        conn.commit()
+        conn.close()
+
+    def enqueue(self, certificates: Iterable[Dict]) -> int:
+        """
+        Queue certificates (``cert_id``, ``hash``, ``name``, ``event``, ``date``,
+        optional ``file_path``); already known cert IDs are skipped. Returns
+        the number of new jobs.
+        """
+        conn = self._connect()
+        before = conn.total_changes
+        conn.executemany('''
+        INSERT OR IGNORE INTO anchor_jobs (cert_id, hash, name, event, date, file_path)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(
+            c["cert_id"],
+            "0x" + c["hash"].removeprefix("0x"),
+            c["name"],
+            c["event"],
+            c["date"],
+            str(c["file_path"]) if c.get("file_path") else None,
+        ) for c in certificates])
+        conn.commit()
+        added = conn.total_changes - before
+        conn.close()
+        return added
+
+    def get(self, cert_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM anchor_jobs WHERE cert_id = ?", (cert_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def jobs(self, status: str, limit: int = -1) -> List[Dict]:
+        """Jobs in ``status``, oldest first (``limit`` -1 means all)."""
+        conn = self._connect()
+        rows = conn.execute('''
+        SELECT * FROM anchor_jobs WHERE status = ? ORDER BY created_at, cert_id LIMIT ?
+        ''', (status, limit)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def mark_submitted(self, cert_id: str, nonce: int, tx_hash: str):
+        conn = self._connect()
+        conn.execute('''
+        UPDATE anchor_jobs
+        SET status = 'submitted', nonce = ?, tx_hash = ?, attempts = attempts + 1,
+            error = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE cert_id = ?
+        ''', (nonce, tx_hash, cert_id))
+        conn.commit()
+        conn.close()
+
+    def update_many(self, updates: List[tuple]):
+        """Apply (cert_id, status, tx_hash, block_number, error) tuples in one transaction."""
+        if not updates:
+            return
+        conn = self._connect()
+        conn.executemany('''
+        UPDATE anchor_jobs
+        SET status = ?, tx_hash = COALESCE(?, tx_hash), block_number = COALESCE(?, block_number),
+            error = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE cert_id = ?
+        ''', [(status, tx_hash, block_number, error, cert_id)
+              for cert_id, status, tx_hash, block_number, error in updates])
+        conn.commit()
+        conn.close()
+
+    def requeue_failed(self) -> int:
+        """Put every failed job back in the queue; returns how many."""
+        conn = self._connect()
+        count = conn.execute('''
+        UPDATE anchor_jobs SET status = 'queued', updated_at = CURRENT_TIMESTAMP WHERE status = 'failed'
+        ''').rowcount
+        conn.commit()
+        conn.close()
+        return count
+
+    def counts(self) -> Dict[str, int]:
+        conn = self._connect()
+        rows = conn.execute("SELECT status, COUNT(*) FROM anchor_jobs GROUP BY status").fetchall()
+        conn.close()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+# ----------------------------
+# Worker
+# ----------------------------
+class AnchorWorker:
+    """
+    Anchors queued certificates in batches through store_certificates_batch.
+
+    Run one worker per signing account: nonces are assigned locally, so two
+    workers sharing an account would collide. Any job found ``submitted``
+    when a batch starts was left behind by a crashed run and is resolved
+    against the chain first; jobs whose hash is already on-chain are marked
+    confirmed without sending anything, so nothing is anchored twice.
+    """
+
+    def __init__(self, queue: AnchorQueue, batch_size: int = 100, poll_interval: float = 2.0,
+                 receipt_timeout: int = 120, max_retries: int = 3):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.receipt_timeout = receipt_timeout
+        self.max_retries = max_retries
+        self._finish = threading.Event()
+        self._thread = None
+
+    def _resolve(self, w3, job: Dict) -> Optional[tuple]:
+        """Final (status, block_number, error) for a job left 'submitted', or None if still pending."""
+        from verify_cert import is_anchored
+
+        try:
+            receipt = w3.eth.get_transaction_receipt(job["tx_hash"])
+        except TransactionNotFound:
+            receipt = None
+        if receipt is not None and receipt["status"] == 1:
+            return "confirmed", receipt["blockNumber"], None
+
+        if receipt is None:
+            # Still in the mempool: check again on the next pass rather than wait here
+            try:
+                w3.eth.get_transaction(job["tx_hash"])
+                return None
+            except TransactionNotFound:
+                pass
+        # Reverted, replaced or never broadcast: it only counts if the hash is on-chain
+        if is_anchored(job["cert_id"], job["hash"]):
+            return "confirmed", None, None
+        if receipt is not None:
+            return "failed", receipt["blockNumber"], "Transaction reverted"
+        return "queued", None, None
+
+    def recover(self) -> int:
+        """
+        Resolve jobs left 'submitted' by an interrupted run; returns how many
+        were settled. Nothing blocks on a receipt: transactions still pending
+        stay 'submitted' and are looked at again on the next pass.
+        """
+        jobs = self.queue.jobs("submitted")
+        if not jobs:
+            return 0
+        w3 = get_web3()
+        updates = []
+        for job in jobs:
+            outcome = self._resolve(w3, job)
+            if outcome is not None:
+                status, block_number, error = outcome
+                updates.append((job["cert_id"], status, None, block_number, error))
+                logging.info(f"♻️ Recovered {job['cert_id']}: {status}")
+        self.queue.update_many(updates)
+        if len(updates) < len(jobs):
+            logging.info(f"⏳ {len(jobs) - len(updates)} recovered transactions still pending")
+        return len(updates)
+
+    def run_once(self) -> int:
+        """Anchor one batch of queued jobs; returns the number of jobs settled."""
+        from store_cert import store_certificates_batch
+
+        settled = self.recover()
+        jobs = self.queue.jobs("queued", self.batch_size)
+        if not jobs:
+            return settled
+
+        # Anything already on-chain (a re-run, or a crash before the submission
+        # was recorded) is settled by store_certificates_batch without a new
+        # transaction: confirmed for the same hash, failed for a different one
+        results = store_certificates_batch(
+            jobs, receipt_timeout=self.receipt_timeout, max_retries=self.max_retries,
+            on_submit=lambda e: self.queue.mark_submitted(e["cert_id"], e["nonce"], e["tx_hash"]),
+        )
+        self.queue.update_many([(r["cert_id"], r["status"], r["tx_hash"], r["block_number"], r["error"])
+                                for r in results])
+        confirmed = sum(1 for r in results if r["status"] == "confirmed")
+        logging.info(f"⚓ Anchored {confirmed}/{len(results)} queued certificates")
+        return settled + len(jobs)
+
+    def run(self):
+        """Keep anchoring until :meth:`finish` is called and the queue is empty."""
+        while True:
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logging.error(f"Anchoring worker error: {e}")
+            if self._finish.is_set():
+                return
+            self._finish.wait(self.poll_interval)
+
+    def drain(self):
+        """Anchor everything currently queued in this thread, then return."""
+        self._finish.set()
+        self.run()
+
+    def start(self):
+        """Run the worker on a background thread."""
+        self._finish.clear()
+        self._thread = threading.Thread(target=self.run, name="anchor-worker", daemon=True)
+        self._thread.start()
+
+    def finish(self):
+        """Let the background worker drain what is queued, then wait for it to exit."""
+        self._finish.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+# ----------------------------
+# Main
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Anchor queued certificates on-chain")
+    parser.add_argument("--db", default=ANCHOR_DB_PATH, help="anchor queue database path")
+    parser.add_argument("--tail", action="store_true", help="keep waiting for new jobs")
+    parser.add_argument("--retry-failed", action="store_true", help="requeue failed jobs first")
+    parser.add_argument("--status", action="store_true", help="only print queue counts")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    queue = AnchorQueue(args.db)
+    if args.retry_failed:
+        logging.info(f"🔁 Requeued {queue.requeue_failed()} failed jobs")
+    if not args.status:
+        worker = AnchorWorker(queue, batch_size=args.batch_size)
+        if args.tail:
+            worker.run()
+        else:
+            worker.drain()
+    logging.info(f"📊 Anchor queue: {queue.counts()}")
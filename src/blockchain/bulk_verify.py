@@ -0,0 +1,232 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from hashing import DigestCache, HASH_CACHE_PATH, read_certificate
+import client
+from client import (get_batch_roots, get_batch_roots_v2, get_contract_v2, get_details_many,
+                    get_hashes_v2)
+from indexer import CertificateIndex, INDEX_DB_PATH
+from merkle import to_bytes, verify_proof
+
+# ----------------------------
+# Bulk verification
+# ----------------------------
+# Files are hashed on a thread pool (hashlib releases the GIL while hashing
+# large reads), skipping files unchanged since the last run when a hash
+# cache is configured (--hash-cache / HASH_CACHE_DB). On-chain records are
+# then resolved in bulk: from the local event index first, and only the
+# remaining IDs go to the node, through array view calls where available.
+
+
+def load_manifest(manifest_path: Path) -> List[Dict]:
+    """Read (cert_id, file) pairs from a CSV or JSON manifest; paths are relative to it."""
+    base = manifest_path.parent
+    with manifest_path.open(encoding="utf-8", newline="") as f:
+        if manifest_path.suffix.lower() == ".json":
+            entries = json.load(f)
+        else:
+            entries = list(csv.DictReader(f))
+    return [{"cert_id": e.get("cert_id") or None, "file": base / e["file"]} for e in entries]
+
+
+def scan_directory(directory: Path) -> List[Dict]:
+    """Every PDF under ``directory``; cert IDs are read from the files themselves."""
+    return [{"cert_id": None, "file": path} for path in sorted(directory.rglob("*.pdf"))]
+
+
+def inspect_file(entry: Dict, cache: Optional[DigestCache] = None) -> Dict:
+    """Hash one certificate file and work out which ID and proof it claims."""
+    path = Path(entry["file"])
+    result = {"file": str(path), "cert_id": entry["cert_id"], "hash": None,
+              "valid": False, "source": None, "reason": None}
+    if not path.exists():
+        result["reason"] = "File not found"
+        return result
+
+    try:
+        record, result["hash"] = read_certificate(path, cache)
+    except Exception as e:
+        # One corrupt or unreadable file must not abort the whole run
+        result["reason"] = f"Unreadable: {e}"
+        return result
+    if record is not None:
+        if result["cert_id"] and result["cert_id"] != record["cert_id"]:
+            result["reason"] = f"File was issued as {record['cert_id']}"
+            return result
+        result["cert_id"] = record["cert_id"]
+
+    proof_path = path.with_suffix(".proof.json")
+    if proof_path.exists():
+        try:
+            with proof_path.open(encoding="utf-8") as f:
+                result["proof"] = json.load(f)
+        except (OSError, ValueError) as e:
+            result["reason"] = f"Unreadable proof: {e}"
+            return result
+        result["cert_id"] = result["cert_id"] or result["proof"].get("cert_id")
+
+    if not result["cert_id"]:
+        result["reason"] = "Unknown certificate ID"
+    return result
+
+
+class ChainReader:
+    """
+    Lazily connected, batched reads against CertificateStorageV2 and then the
+    original CertificateStorage. v2 keeps metadata in its event log only, so
+    its records come back without name/event/date (the local index has them).
+    """
+
+    def get_details(self, cert_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        found: Dict[str, Optional[Dict]] = {cert_id: None for cert_id in cert_ids}
+        if cert_ids and get_contract_v2() is not None:
+            for cert_id, cert_hash in zip(cert_ids, get_hashes_v2(cert_ids)):
+                if any(cert_hash):
+                    found[cert_id] = {"name": None, "event": None, "date": None,
+                                      "hash": "0x" + cert_hash.hex()}
+        missing = [cert_id for cert_id in cert_ids if found[cert_id] is None]
+        if missing and client.CONTRACT_ADDRESS:
+            for cert_id, d in zip(missing, get_details_many(missing)):
+                if d[0]:
+                    found[cert_id] = {"name": d[0], "event": d[1], "date": d[2],
+                                      "hash": "0x" + bytes(d[3]).hex()}
+        return found
+
+    def get_batch_roots(self, batch_ids: List[str]) -> Dict[str, bytes]:
+        roots = {batch_id: bytes(32) for batch_id in batch_ids}
+        if batch_ids and get_contract_v2() is not None:
+            roots.update(zip(batch_ids, get_batch_roots_v2(batch_ids)))
+        missing = [batch_id for batch_id in batch_ids if not any(roots[batch_id])]
+        if missing and client.CONTRACT_ADDRESS:
+            roots.update(zip(missing, get_batch_roots(missing)))
+        return roots
+
+
+def lookup_records(cert_ids: List[str], index: Optional[CertificateIndex] = None,
+                   chain: Optional[ChainReader] = None) -> Tuple[Dict[str, Optional[Dict]], Dict[str, str]]:
+    """
+    Resolve many cert IDs from the local index first and the chain for the
+    rest. Returns (records, sources): a record (or None if unknown) and
+    "index"/"chain" for every ID that could be looked up.
+    """
+    records: Dict[str, Optional[Dict]] = {}
+    sources: Dict[str, str] = {}
+    if index is not None:
+        for cert_id, row in index.get_many(cert_ids).items():
+            records[cert_id], sources[cert_id] = row, "index"
+    if chain is not None:
+        missing = [c for c in dict.fromkeys(cert_ids) if c not in records]
+        for cert_id, row in chain.get_details(missing).items():
+            records[cert_id], sources[cert_id] = row, "chain"
+    return records, sources
+
+
+def verify_all(entries: List[Dict], index: Optional[CertificateIndex] = None,
+               use_chain: bool = True, workers: Optional[int] = None,
+               cache: Optional[DigestCache] = None) -> Dict:
+    """Verify many certificate files and return a machine-readable report."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda entry: inspect_file(entry, cache), entries))
+    if cache is not None:
+        cache.flush()
+
+    chain = ChainReader() if use_chain else None
+    pending = [r for r in results if r["reason"] is None]
+    batched = [r for r in pending if "proof" in r]
+    single = [r for r in pending if "proof" not in r]
+
+    # Batch-anchored certificates: one root lookup per batch, then a local hash walk
+    batch_ids = sorted({r["proof"]["batch_id"] for r in batched})
+    roots: Dict[str, bytes] = {}
+    if index is not None:
+        for batch_id in batch_ids:
+            row = index.get_batch(batch_id)
+            if row:
+                roots[batch_id] = to_bytes(row["root"])
+    if chain is not None:
+        roots.update(chain.get_batch_roots([b for b in batch_ids if b not in roots]))
+
+    for r in batched:
+        proof = r.pop("proof")
+        root = roots.get(proof["batch_id"])
+        r["source"] = "batch"
+        if proof.get("cert_id") != r["cert_id"]:
+            r["reason"] = f"Proof is for {proof.get('cert_id')}"
+        elif root is None or not any(root):
+            r["reason"] = f"Batch {proof['batch_id']} not anchored"
+        elif to_bytes(proof["root"]) != root or not verify_proof(r["hash"], proof["proof"], root):
+            r["reason"] = "Not included in batch"
+        else:
+            r.update(valid=True, name=proof.get("name"), event=proof.get("event"), date=proof.get("date"))
+
+    # Individually anchored certificates: local index first, then batched RPC
+    records, sources = lookup_records([r["cert_id"] for r in single], index, chain)
+
+    for r in single:
+        record = records.get(r["cert_id"])
+        r["source"] = sources.get(r["cert_id"])
+        if record is None:
+            r["reason"] = "Certificate not found"
+        elif to_bytes(record["hash"]) != to_bytes(r["hash"]):
+            r["reason"] = "Hash mismatch"
+        else:
+            r.update(valid=True, name=record["name"], event=record["event"], date=record["date"])
+
+    for r in results:
+        r.pop("proof", None)
+
+    valid = sum(1 for r in results if r["valid"])
+    return {
+        "summary": {"total": len(results), "valid": valid, "invalid": len(results) - valid},
+        "results": results,
+    }
+
+
+def write_report(report: Dict, output, fmt: str = "json"):
+    if fmt == "csv":
+        fields = ["file", "cert_id", "valid", "reason", "source", "hash", "name", "event", "date"]
+        writer = csv.DictWriter(output, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(report["results"])
+    else:
+        json.dump(report, output, indent=2, ensure_ascii=False)
+        output.write("\n")
+
+
+# ----------------------------
+# Main
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify a directory or manifest of certificate files")
+    parser.add_argument("path", type=Path, help="directory of PDFs, or a CSV/JSON manifest of cert_id,file")
+    parser.add_argument("--index", default=INDEX_DB_PATH, help="local certificate index to consult first")
+    parser.add_argument("--no-chain", action="store_true", help="only use the local index")
+    parser.add_argument("--workers", type=int, default=None, help="hashing threads")
+    parser.add_argument("--hash-cache", default=HASH_CACHE_PATH,
+                        help="SQLite cache of file hashes; unchanged files are not re-hashed")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--output", type=Path, help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    entries = scan_directory(args.path) if args.path.is_dir() else load_manifest(args.path)
+    index = CertificateIndex(args.index) if os.path.exists(args.index) else None
+    cache = DigestCache(args.hash_cache) if args.hash_cache else None
+    report = verify_all(entries, index=index, use_chain=not args.no_chain, workers=args.workers,
+                        cache=cache)
+
+    if args.output:
+        with args.output.open("w", encoding="utf-8", newline="") as f:
+            write_report(report, f, args.format)
+    else:
+        write_report(report, sys.stdout, args.format)
+
+    summary = report["summary"]
+    logging.info(f"📊 {summary['valid']}/{summary['total']} certificates valid")
+    sys.exit(0 if summary["invalid"] == 0 else 1)
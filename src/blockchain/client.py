@@ -0,0 +1,389 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from eth_utils.abi import get_abi_output_types
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+
+# ----------------------------
+# Shared blockchain client
+# ----------------------------
+# One place that connects to the node and loads CertificateStorage, instead
+# of every module building its own Web3 at import time. Nothing connects
+# until first use, and all calls reuse keep-alive HTTP connections:
+#   - get_web3() / get_contract(), over a pooled requests.Session
+#   - batched reads: batch_call() for known sets of calls, and get_reader()
+#     to coalesce reads from concurrent callers into JSON-RPC batches.
+#   - bulk views: verify_hashes(), get_details_many() and get_batch_roots()
+#     use the array view functions of the CertificateStorageViews helper
+#     (when CONTRACT_VIEWS_ADDRESS is set), one eth_call per chunk.
+#   - CertificateStorageV2 (when CONTRACT_V2_ADDRESS is set): get_contract_v2(),
+#     cert_key() and the *_v2 bulk views. New certificates are written there
+#     (see get_write_contract()); verify_cert reads both versions.
+load_dotenv()
+
+RPC_URL = os.getenv("RPC_URL", "http://127.0.0.1:7545")
+CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS")
+CONTRACT_ARTIFACT = os.getenv(
+    "CONTRACT_ARTIFACT",
+    str(Path(__file__).resolve().parents[2] / "build" / "contracts" / "CertificateStorage.json"),
+)
+CONTRACT_VIEWS_ADDRESS = os.getenv("CONTRACT_VIEWS_ADDRESS")
+CONTRACT_VIEWS_ARTIFACT = os.getenv(
+    "CONTRACT_VIEWS_ARTIFACT",
+    str(Path(CONTRACT_ARTIFACT).with_name("CertificateStorageViews.json")),
+)
+CONTRACT_V2_ADDRESS = os.getenv("CONTRACT_V2_ADDRESS")
+CONTRACT_V2_ARTIFACT = os.getenv(
+    "CONTRACT_V2_ARTIFACT",
+    str(Path(CONTRACT_ARTIFACT).with_name("CertificateStorageV2.json")),
+)
+# Lower bound for CertificateStored log lookups on v2 (its deployment block)
+CONTRACT_V2_START_BLOCK = int(os.getenv("CONTRACT_V2_START_BLOCK", "0"))
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "32"))
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "30"))
+RPC_BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", "100"))
+RPC_BATCH_WINDOW = float(os.getenv("RPC_BATCH_WINDOW_MS", "5")) / 1000
+# IDs per array view call; well inside the default eth_call gas cap
+VIEW_BATCH_SIZE = int(os.getenv("VIEW_BATCH_SIZE", "200"))
+
+_lock = threading.Lock()
+_session = None
+_w3 = None
+_contract = None
+_contract_v2 = None
+_views = None
+_reader = None
+
+
+@lru_cache(maxsize=None)
+def load_abi(artifact_path: str = CONTRACT_ARTIFACT) -> list:
+    """ABI from a Truffle build artifact, read from disk once."""
+    with open(artifact_path, encoding="utf-8") as f:
+        return json.load(f)["abi"]
+
+
+def _contract_address() -> str:
+    if not CONTRACT_ADDRESS:
+        raise EnvironmentError("Missing CONTRACT_ADDRESS in .env")
+    return Web3.to_checksum_address(CONTRACT_ADDRESS)
+
+
+# ----------------------------
+# Sync surface
+# ----------------------------
+def get_web3() -> Web3:
+    """Shared Web3 instance with a keep-alive connection pool."""
+    global _session, _w3
+    with _lock:
+        if _w3 is None:
+            session = requests.Session()
+            # requests keeps at most 10 connections per host by default, fewer
+            # than the thread pools in store_cert/bulk_verify use
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=RPC_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            w3 = Web3(Web3.HTTPProvider(RPC_URL, session=session,
+                                        request_kwargs={"timeout": RPC_TIMEOUT}))
+            if not w3.is_connected():
+                session.close()
+                raise ConnectionError(f"Failed to connect to blockchain at {RPC_URL}")
+            _session, _w3 = session, w3
+        return _w3
+
+
+def get_contract():
+    """Shared CertificateStorage contract bound to :func:`get_web3`."""
+    global _contract
+    w3 = get_web3()
+    with _lock:
+        if _contract is None:
+            _contract = w3.eth.contract(address=_contract_address(), abi=load_abi())
+        return _contract
+
+
+def get_views_contract():
+    """Shared CertificateStorageViews helper, or None if CONTRACT_VIEWS_ADDRESS is not set."""
+    global _views
+    if not CONTRACT_VIEWS_ADDRESS:
+        return None
+    w3 = get_web3()
+    with _lock:
+        if _views is None:
+            _views = w3.eth.contract(address=Web3.to_checksum_address(CONTRACT_VIEWS_ADDRESS),
+                                     abi=load_abi(CONTRACT_VIEWS_ARTIFACT))
+        return _views
+
+
+def cert_key(cert_id: str) -> bytes:
+    """keccak256 of a cert (or batch) ID: the key CertificateStorageV2 stores it under."""
+    return Web3.keccak(text=cert_id)
+
+
+def get_contract_v2():
+    """Shared CertificateStorageV2 contract, or None if CONTRACT_V2_ADDRESS is not set."""
+    global _contract_v2
+    if not CONTRACT_V2_ADDRESS:
+        return None
+    w3 = get_web3()
+    with _lock:
+        if _contract_v2 is None:
+            _contract_v2 = w3.eth.contract(address=Web3.to_checksum_address(CONTRACT_V2_ADDRESS),
+                                           abi=load_abi(CONTRACT_V2_ARTIFACT))
+        return _contract_v2
+
+
+def get_contracts() -> List:
+    """Every configured contract version, newest first."""
+    contracts = [get_contract_v2()]
+    if CONTRACT_ADDRESS:
+        contracts.append(get_contract())
+    return [c for c in contracts if c is not None]
+
+
+def get_write_contract():
+    """Contract new certificates are anchored to: v2 when deployed, else the original."""
+    return get_contract_v2() or get_contract()
+
+
+# ----------------------------
+# Batched reads
+# ----------------------------
+# What a view call raises when it reverts or the contract lacks the function
+CALL_ERRORS = (BadFunctionCallOutput, ContractLogicError)
+_RAISE = object()
+
+
+def _call_request(call) -> Tuple[str, list]:
+    """The eth_call JSON-RPC request behind a contract function call."""
+    return "eth_call", [{"to": call.address, "data": call._encode_transaction_data()}, "latest"]
+
+
+def _decode_output(call, data: str):
+    """Decode eth_call output the way ``ContractFunction.call()`` returns it."""
+    values = [list(v) if isinstance(v, tuple) else v
+              for v in call.w3.codec.decode(get_abi_output_types(call.abi), HexBytes(data))]
+    return values[0] if len(values) == 1 else values
+
+
+def _execute_batch(w3, calls: List) -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Run contract calls as one JSON-RPC batch; ``(result, error)`` per call.
+
+    The batch is posted with ``provider.make_batch_request`` rather than
+    ``w3.batch_requests()``, which switches the whole provider into batching
+    mode and would capture calls made meanwhile by other threads (event
+    listeners, other readers) sharing the same Web3.
+    """
+    outcomes: List[Optional[Tuple[Any, Optional[Exception]]]] = [None] * len(calls)
+    try:
+        responses = w3.provider.make_batch_request([_call_request(call) for call in calls])
+        if not isinstance(responses, list):
+            raise ValueError(responses.get("error"))
+        for i, (call, response) in enumerate(zip(calls, responses)):
+            if "error" not in response:
+                outcomes[i] = (_decode_output(call, response["result"]), None)
+    except Exception as e:
+        # Not every node (or provider) supports batches; fall back to single calls
+        logging.debug(f"Batch of {len(calls)} calls failed ({e}), retrying individually")
+    # Calls the node answered with an error (usually a revert) are repeated on
+    # their own so they raise web3's usual exceptions
+    for i, outcome in enumerate(outcomes):
+        if outcome is None:
+            try:
+                outcomes[i] = (calls[i].call(), None)
+            except Exception as e:
+                outcomes[i] = (None, e)
+    return outcomes
+
+
+def batch_call(calls: List, default=_RAISE) -> List:
+    """
+    Results of many contract calls, sent in JSON-RPC batches of RPC_BATCH_SIZE.
+    With ``default``, calls that revert return it instead of raising.
+    """
+    w3 = get_web3()
+    results = []
+    for i in range(0, len(calls), RPC_BATCH_SIZE):
+        for result, error in _execute_batch(w3, calls[i:i + RPC_BATCH_SIZE]):
+            if error is not None:
+                if default is _RAISE or not isinstance(error, CALL_ERRORS):
+                    raise error
+                result = default
+            results.append(result)
+    return results
+
+
+class CoalescingReader:
+    """
+    Merge contract reads from concurrent callers into JSON-RPC batches.
+
+    Each caller blocks on its own result as before, but reads that arrive
+    within ``window`` seconds of each other (up to ``max_batch``) go to the
+    node as one batch request. Batches are sent from a small thread pool so
+    one slow batch does not hold up the next; each is a self-contained HTTP
+    request (see :func:`_execute_batch`), so they never share provider state.
+    """
+
+    def __init__(self, w3, window: float = RPC_BATCH_WINDOW, max_batch: int = RPC_BATCH_SIZE,
+                 max_in_flight: int = 4):
+        self.w3 = w3
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="rpc-batch")
+        threading.Thread(target=self._collect, name="rpc-coalescer", daemon=True).start()
+
+    def call_many(self, calls: List) -> List:
+        """Results of ``calls`` in order; raises the first call's error, if any."""
+        futures = []
+        for call in calls:
+            future = Future()
+            self._queue.put((call, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def call(self, call):
+        return self.call_many([call])[0]
+
+    def _collect(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._flush, pending)
+
+    def _flush(self, pending: List):
+        try:
+            outcomes = _execute_batch(self.w3, [call for call, _ in pending])
+        except Exception as e:
+            outcomes = [(None, e)] * len(pending)
+        for (_, future), (result, error) in zip(pending, outcomes):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def get_reader() -> CoalescingReader:
+    """Shared :class:`CoalescingReader` over :func:`get_web3`."""
+    global _reader
+    w3 = get_web3()
+    with _lock:
+        if _reader is None:
+            _reader = CoalescingReader(w3)
+        return _reader
+
+
+# ----------------------------
+# Bulk views
+# ----------------------------
+def _bulk_view(batched, single, items: List, default=_RAISE) -> List:
+    """
+    Call ``batched(views, chunk)`` on the CertificateStorageViews helper once
+    per VIEW_BATCH_SIZE items. Without the helper, or for a chunk it cannot
+    answer, per-item ``single(item)`` calls are sent as JSON-RPC batches
+    (see :func:`batch_call` for ``default``).
+    """
+    views = get_views_contract()
+    results = []
+    for i in range(0, len(items), VIEW_BATCH_SIZE):
+        chunk = items[i:i + VIEW_BATCH_SIZE]
+        if views is not None:
+            try:
+                results.extend(batched(views, chunk).call())
+                continue
+            except CALL_ERRORS as e:
+                logging.warning(f"CertificateStorageViews call failed ({e}), "
+                                "falling back to per-certificate calls")
+        results.extend(batch_call([single(item) for item in chunk], default))
+    return results
+
+
+def verify_hashes(pairs: List[Tuple[str, str]]) -> List[bool]:
+    """verifyCertificate for many (cert_id, hash) pairs, in order."""
+    contract = get_contract()
+    return _bulk_view(
+        lambda views, chunk: views.functions.verifyCertificates([c for c, _ in chunk], [h for _, h in chunk]),
+        lambda pair: contract.functions.verifyCertificate(*pair),
+        list(pairs),
+    )
+
+
+def get_details_many(cert_ids: List[str]) -> List[tuple]:
+    """(name, event, date, hash) for many cert IDs, in order; unknown IDs have an empty name."""
+    contract = get_contract()
+    return [tuple(d) for d in _bulk_view(
+        lambda views, chunk: views.functions.getCertificateDetailsBatch(chunk),
+        lambda cert_id: contract.functions.getCertificateDetails(cert_id),
+        list(cert_ids),
+    )]
+
+
+def get_batch_roots(batch_ids: List[str]) -> List[bytes]:
+    """
+    Merkle roots for many batch IDs, in order; unknown batches are all zeros,
+    as is every batch on a deployment that predates batch roots.
+    """
+    contract = get_contract()
+    return [bytes(root) for root in _bulk_view(
+        lambda views, chunk: views.functions.getBatchRoots(chunk),
+        lambda batch_id: contract.functions.getBatchRoot(batch_id),
+        list(batch_ids),
+        default=bytes(32),
+    )]
+
+
+def _chunked(call, items: List) -> List:
+    results = []
+    for i in range(0, len(items), VIEW_BATCH_SIZE):
+        results.extend(call(items[i:i + VIEW_BATCH_SIZE]))
+    return results
+
+
+def verify_hashes_v2(pairs: List[Tuple[str, str]]) -> List[bool]:
+    """CertificateStorageV2 verifyCertificates for many (cert_id, hash) pairs, in order."""
+    contract = get_contract_v2()
+    return _chunked(lambda chunk: contract.functions.verifyCertificates(
+        [cert_key(c) for c, _ in chunk], [h for _, h in chunk]).call(), list(pairs))
+
+
+def get_hashes_v2(cert_ids: List[str]) -> List[bytes]:
+    """Stored hashes from CertificateStorageV2 for many cert IDs; unknown IDs are all zeros."""
+    contract = get_contract_v2()
+    return _chunked(lambda chunk: [bytes(h) for h in contract.functions.getCertificates(
+        [cert_key(c) for c in chunk]).call()], list(cert_ids))
+
+
+def get_batch_roots_v2(batch_ids: List[str]) -> List[bytes]:
+    """Merkle roots from CertificateStorageV2 for many batch IDs; unknown batches are all zeros."""
+    contract = get_contract_v2()
+    return _chunked(lambda chunk: [bytes(r) for r in contract.functions.getBatchRoots(
+        [cert_key(b) for b in chunk]).call()], list(batch_ids))
+
+
+def close():
+    """Close the shared HTTP session (optional; it is daemon-owned)."""
+    global _session, _w3, _contract, _contract_v2, _views, _reader
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = _w3 = _contract = _contract_v2 = _views = _reader = None
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+from PIL import PdfParser
+
+# ----------------------------
+# Canonical certificate content
+# ----------------------------
+# Certificates are anchored by the SHA-256 of the exact PDF bytes delivered,
+# so any edit to the page or its metadata breaks verification. The canonical
+# record is embedded in the PDF metadata only to tell which certificate a
+# file claims to be (its cert_id) and whether a row's content changed between
+# runs; it proves nothing by itself, since anyone can copy it into a PDF.
+RECORD_FIELDS = ("cert_id", "name", "event", "date", "achievement")
+
+
+def _normalize(value) -> str:
+    return unicodedata.normalize("NFC", str(value if value is not None else "")).strip()
+
+
+def canonical_record(cert_id, name, event, date, achievement) -> str:
+    """Serialize certificate content to a stable JSON string."""
+    values = dict(zip(RECORD_FIELDS, (cert_id, name, event, date, achievement)))
+    return json.dumps({k: _normalize(v) for k, v in values.items()},
+                      sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def canonical_hash(record: str) -> str:
+    """SHA-256 (hex, no 0x prefix) of a canonical record."""
+    return hashlib.sha256(record.encode("utf-8")).hexdigest()
+
+
+def stable_cert_id(name, event, date, achievement, person="") -> str:
+    """
+    Certificate ID derived from row content, so it survives CSV reordering.
+    ``person`` (an email address or other per-participant key) keeps two
+    people with the same name and award apart.
+    """
+    record = canonical_record("", name, event, date, achievement)
+    if _normalize(person):
+        record += "\n" + _normalize(person)
+    return f"CERT-{canonical_hash(record)[:12].upper()}"
+
+
+def read_embedded_record(file_path: Path) -> Optional[Dict]:
+    """Return the canonical certificate record embedded in a PDF's metadata, if any."""
+    try:
+        with file_path.open("rb") as f:
+            return embedded_record(f)
+    except OSError:
+        return None
+
+
+def embedded_record(f: BinaryIO) -> Optional[Dict]:
+    """:func:`read_embedded_record` for an open PDF file or in-memory buffer."""
+    try:
+        parser = PdfParser.PdfParser(f=f)
+        keywords = getattr(parser.info, "Keywords", None)
+        parser.close()
+        record = json.loads(keywords) if keywords else None
+    except Exception:
+        return None
+    if not isinstance(record, dict) or not all(k in record for k in RECORD_FIELDS):
+        return None
+    return record
+
+
+# ----------------------------
+# File hashing
+# ----------------------------
+# Every file hash in the project goes through here. Anchored hashes are
+# always SHA-256 (0x-prefixed); BLAKE3 is available for callers that only
+# need a fast local fingerprint of large files and have the optional
+# ``blake3`` package installed. All digests release the GIL, so callers hash
+# many files concurrently on a thread pool.
+HASH_CACHE_PATH = os.getenv("HASH_CACHE_DB")
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path: Path, algorithm: str = "sha256") -> str:
+    """Hex digest (no prefix) of a file, read with large zero-copy reads."""
+    file_path = Path(file_path)
+    if algorithm == "blake3":
+        try:
+            import blake3
+        except ImportError:
+            raise ImportError("BLAKE3 digests need the optional 'blake3' package (pip install blake3)")
+        # Memory-mapped and tree-hashed across all cores
+        hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        hasher.update_mmap(str(file_path))
+        return hasher.hexdigest()
+
+    with file_path.open("rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, algorithm).hexdigest()
+        digest = hashlib.new(algorithm)
+        if f.seek(0, 2):  # mmap cannot map empty files
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        return digest.hexdigest()
+
+
+def stream_hash(stream: BinaryIO, destination: Optional[BinaryIO] = None) -> str:
+    """SHA-256 (0x-prefixed) of a stream read in chunks, optionally copying it to ``destination``."""
+    sha256 = hashlib.sha256()
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        sha256.update(chunk)
+        if destination is not None:
+            destination.write(chunk)
+    if destination is not None:
+        destination.flush()
+    return "0x" + sha256.hexdigest()
+
+
+class DigestCache:
+    """
+    Persistent (path, size, mtime) -> digest cache in SQLite.
+
+    An entry is only reused while the file's size and modification time are
+    unchanged, so re-verifying a large archive only hashes files that were
+    added or modified since the last run. Each thread keeps one connection
+    open, and new digests are written in batches of ``flush_every``; call
+    :meth:`flush` once a run is done to save the rest.
+    """
+
+    def __init__(self, db_path: str, flush_every: int = 500):
+        self.db_path = db_path
+        self.flush_every = flush_every
+        self._local = threading.local()
+        self._pending: Dict[Tuple[str, str], Tuple] = {}
+        self._lock = threading.Lock()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS digests (
+            path TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (path, kind)
+        )
+        ''')
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.db_path, timeout=30)
+        return conn
+
+    def get_or_compute(self, file_path: Path, kind: str, compute: Callable[[Path], str]) -> str:
+        """Cached ``compute(file_path)`` for this ``kind`` of digest, recomputed if the file changed."""
+        path = str(Path(file_path).resolve())
+        stat = os.stat(path)
+        with self._lock:
+            row = self._pending.get((path, kind))
+        if row is None:
+            row = self._connection().execute(
+                "SELECT path, kind, size, mtime_ns, value FROM digests WHERE path = ? AND kind = ?",
+                (path, kind)).fetchone()
+        if row and row[2] == stat.st_size and row[3] == stat.st_mtime_ns:
+            return row[4]
+
+        value = compute(Path(file_path))
+        with self._lock:
+            self._pending[(path, kind)] = (path, kind, stat.st_size, stat.st_mtime_ns, value)
+            full = len(self._pending) >= self.flush_every
+        if full:
+            self.flush()
+        return value
+
+    def flush(self):
+        """Write digests computed since the last flush in one transaction."""
+        with self._lock:
+            rows, self._pending = list(self._pending.values()), {}
+        if rows:
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?)", rows)
+            conn.commit()
+
+
+def file_hash(file_path: Path, cache: Optional[DigestCache] = None) -> str:
+    """SHA-256 (0x-prefixed) of a file's bytes."""
+    if cache is not None:
+        return cache.get_or_compute(file_path, "sha256", file_hash)
+    return "0x" + file_digest(file_path)
+
+
+def _read_record(file_path: Path) -> str:
+    return json.dumps(read_embedded_record(file_path), ensure_ascii=False)
+
+
+def read_certificate(file_path: Path, cache: Optional[DigestCache] = None) -> Tuple[Optional[Dict], str]:
+    """
+    The embedded record (or None) and hash of a delivered certificate. The
+    hash is always that of the file's bytes; the record only names the
+    certificate the file claims to be.
+    """
+    file_path = Path(file_path)
+    if cache is not None:
+        record = json.loads(cache.get_or_compute(file_path, "record", _read_record))
+    else:
+        record = read_embedded_record(file_path)
+    return record, file_hash(file_path, cache)
+
+
+def certificate_hash(file_path: Path, cache: Optional[DigestCache] = None) -> str:
+    """Hash a delivered certificate: the SHA-256 of its bytes."""
+    return file_hash(file_path, cache)
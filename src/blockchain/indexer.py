@@ -0,0 +1,284 @@
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from web3 import Web3
+
+import client
+
+# ----------------------------
+# Setup
+# ----------------------------
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+load_dotenv()
+
+INDEX_DB_PATH = os.getenv("CERT_INDEX_DB", "certificate_index.db")
+INDEX_START_BLOCK = int(os.getenv("CERT_INDEX_START_BLOCK", "0"))
+
+
+def sync_targets() -> List[tuple]:
+    """(contract, state_key, start_block) for each configured contract version."""
+    targets = []
+    if client.CONTRACT_ADDRESS:
+        targets.append((client.get_contract(), "last_block", INDEX_START_BLOCK))
+    if client.get_contract_v2() is not None:
+        targets.append((client.get_contract_v2(), "last_block_v2",
+                        max(INDEX_START_BLOCK, client.CONTRACT_V2_START_BLOCK)))
+    return targets
+
+
+# ----------------------------
+# Index
+# ----------------------------
+class CertificateIndex:
+    """
+    Local SQLite index of CertificateStored (and BatchRootStored) events.
+
+    The index only ever reads the chain through event logs, so it can be
+    rebuilt from scratch at any time and resumes from the last block it
+    processed. Read methods never touch the chain.
+    """
+
+    def __init__(self, db_path: str = INDEX_DB_PATH):
+        self.db_path = db_path
+        self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        conn.executescript('''
+        CREATE TABLE IF NOT EXISTS certificates (
+            cert_id TEXT PRIMARY KEY,
+            hash TEXT NOT NULL,
+            name TEXT,
+            event TEXT,
+            date TEXT,
+            block_number INTEGER NOT NULL,
+            tx_hash TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_certificates_hash ON certificates (hash);
+        CREATE INDEX IF NOT EXISTS idx_certificates_event_date ON certificates (event, date);
+        CREATE INDEX IF NOT EXISTS idx_certificates_date ON certificates (date);
+
+        CREATE TABLE IF NOT EXISTS batches (
+            batch_id TEXT PRIMARY KEY,
+            root TEXT NOT NULL,
+            count INTEGER,
+            block_number INTEGER NOT NULL,
+            tx_hash TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER
+        );
+        ''')
+        conn.commit()
+        conn.close()
+
+    # ----------------------------
+    # Sync
+    # ----------------------------
+    def last_block(self, state_key: Optional[str] = None) -> Optional[int]:
+        """
+        Last block whose events have been fully indexed, or None if never
+        synced. Without ``state_key``, the lowest position across contracts.
+        """
+        conn = self._connect()
+        if state_key is None:
+            row = conn.execute("SELECT MIN(value) FROM sync_state").fetchone()
+        else:
+            row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (state_key,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def sync(self, w3, contract, chunk_size: int = 2000, confirmations: int = 0,
+             state_key: str = "last_block", start_block: int = INDEX_START_BLOCK) -> int:
+        """
+        Replay events from the last processed block up to the chain head
+        (minus ``confirmations``), in ``chunk_size`` block ranges. Each range
+        is committed together with the new sync position, so an interrupted
+        sync resumes without gaps or duplicates. Returns the number of events applied.
+
+        Both contract versions emit CertificateStored/BatchRootStored with the
+        same argument names; each is tracked under its own ``state_key``.
+        """
+        last = self.last_block(state_key)
+        from_block = start_block if last is None else last + 1
+        head = w3.eth.block_number - confirmations
+        applied = 0
+
+        while from_block <= head:
+            to_block = min(from_block + chunk_size - 1, head)
+            stored = contract.events.CertificateStored.get_logs(from_block=from_block, to_block=to_block)
+            batches = contract.events.BatchRootStored.get_logs(from_block=from_block, to_block=to_block)
+
+            conn = self._connect()
+            try:
+                conn.executemany('''
+                INSERT OR IGNORE INTO certificates (cert_id, hash, name, event, date, block_number, tx_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [(
+                    e["args"]["certID"],
+                    Web3.to_hex(e["args"]["hash"]),
+                    e["args"]["name"],
+                    e["args"]["eventName"],
+                    e["args"]["date"],
+                    e["blockNumber"],
+                    Web3.to_hex(e["transactionHash"]),
+                ) for e in stored])
+                conn.executemany('''
+                INSERT OR IGNORE INTO batches (batch_id, root, count, block_number, tx_hash)
+                VALUES (?, ?, ?, ?, ?)
+                ''', [(
+                    e["args"]["batchID"],
+                    Web3.to_hex(e["args"]["root"]),
+                    e["args"]["count"],
+                    e["blockNumber"],
+                    Web3.to_hex(e["transactionHash"]),
+                ) for e in batches])
+                conn.execute('''
+                INSERT INTO sync_state (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                ''', (state_key, to_block))
+                conn.commit()
+            finally:
+                conn.close()
+
+            applied += len(stored) + len(batches)
+            logging.info(f"📚 Indexed blocks {from_block}-{to_block}: "
+                         f"{len(stored)} certificates, {len(batches)} batches")
+            from_block = to_block + 1
+
+        return applied
+
+    def sync_all(self, w3, confirmations: int = 0) -> int:
+        """Sync every configured contract version; returns the events applied."""
+        applied = 0
+        for contract, state_key, start_block in sync_targets():
+            applied += self.sync(w3, contract, confirmations=confirmations,
+                                 state_key=state_key, start_block=start_block)
+        return applied
+
+    def tail(self, w3, poll_interval: float = 2.0, confirmations: int = 0):
+        """Sync, then keep following new blocks until interrupted."""
+        while True:
+            try:
+                self.sync_all(w3, confirmations=confirmations)
+            except Exception as e:
+                logging.error(f"Indexer sync error: {e}")
+            time.sleep(poll_interval)
+
+    # ----------------------------
+    # Queries
+    # ----------------------------
+    def get(self, cert_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM certificates WHERE cert_id = ?", (cert_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def get_many(self, cert_ids: List[str]) -> Dict[str, Dict]:
+        """Look up many certificates at once, keyed by cert_id (missing IDs are omitted)."""
+        found = {}
+        conn = self._connect()
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(cert_ids), 500):
+            chunk = cert_ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT * FROM certificates WHERE cert_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((row["cert_id"], dict(row)) for row in rows)
+        conn.close()
+        return found
+
+    def get_by_hash(self, cert_hash: str) -> Optional[Dict]:
+        cert_hash = cert_hash.lower()
+        if not cert_hash.startswith("0x"):
+            cert_hash = "0x" + cert_hash
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM certificates WHERE hash = ?", (cert_hash,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def search(self, event: Optional[str] = None, date: Optional[str] = None,
+               name: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """Search certificates by exact event/date and partial name, newest first."""
+        clauses, params = [], []
+        if event is not None:
+            clauses.append("event = ?")
+            params.append(event)
+        if date is not None:
+            clauses.append("date = ?")
+            params.append(date)
+        if name is not None:
+            clauses.append("name LIKE ?")
+            params.append(f"%{name}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        conn = self._connect()
+        rows = conn.execute(f'''
+        SELECT * FROM certificates {where}
+        ORDER BY block_number DESC
+        LIMIT ? OFFSET ?
+        ''', (*params, limit, offset)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def count(self, event: Optional[str] = None) -> int:
+        conn = self._connect()
+        if event is None:
+            total = conn.execute("SELECT COUNT(*) FROM certificates").fetchone()[0]
+        else:
+            total = conn.execute("SELECT COUNT(*) FROM certificates WHERE event = ?", (event,)).fetchone()[0]
+        conn.close()
+        return total
+
+    def get_statistics(self) -> Dict:
+        conn = self._connect()
+        total_certificates = conn.execute("SELECT COUNT(*) FROM certificates").fetchone()[0]
+        total_batches = conn.execute("SELECT COUNT(*) FROM batches").fetchone()[0]
+        per_event = conn.execute('''
+        SELECT event, COUNT(*) FROM certificates GROUP BY event ORDER BY COUNT(*) DESC
+        ''').fetchall()
+        conn.close()
+        return {
+            'total_certificates': total_certificates,
+            'total_batches': total_batches,
+            'last_block': self.last_block(),
+            'per_event': {event: count for event, count in per_event},
+        }
+
+
+# ----------------------------
+# Main
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index CertificateStored events into SQLite")
+    parser.add_argument("--db", default=INDEX_DB_PATH, help="index database path")
+    parser.add_argument("--tail", action="store_true", help="keep following new blocks")
+    parser.add_argument("--confirmations", type=int, default=0, help="blocks to wait before indexing")
+    args = parser.parse_args()
+
+    w3 = client.get_web3()
+    index = CertificateIndex(args.db)
+    if args.tail:
+        index.tail(w3, confirmations=args.confirmations)
+    else:
+        applied = index.sync_all(w3, confirmations=args.confirmations)
+        logging.info(f"✅ Index up to date at block {index.last_block()} ({applied} new events)")
@@ -0,0 +1,114 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+from pathlib import Path
+from typing import Dict
+
+from web3 import Web3
+
+from client import CONTRACT_ARTIFACT, CONTRACT_V2_ARTIFACT, get_web3
+
+# ----------------------------
+# Gas measurement
+# ----------------------------
+# Deploys fresh copies of CertificateStorage and CertificateStorageV2 on a
+# local development chain (Ganache, `truffle develop`) with an unlocked
+# account, anchors the same sample certificates to both and reports the gas
+# each storeCertificate / storeBatchRoot actually used. Either run
+# `truffle compile` first so both build artifacts exist, or pass --compile to
+# build contracts/*.sol here with the optional py-solc-x package. Artifacts
+# compiled from a different source than contracts/*.sol are refused, so the
+# figures always belong to the contracts in this tree.
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+CONTRACTS_DIR = Path(__file__).resolve().parents[2] / "contracts"
+# Same compiler as truffle-config.js
+SOLC_VERSION = "0.8.0"
+
+
+def read_source(contract_name: str) -> str:
+    # Line endings kept as checked out, as truffle records them in "source"
+    with open(CONTRACTS_DIR / f"{contract_name}.sol", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def compile_artifact(contract_name: str, solc_version: str = SOLC_VERSION) -> Dict:
+    """Compile contracts/<contract_name>.sol into a truffle-style {"abi", "bytecode"} artifact."""
+    try:
+        import solcx
+    except ImportError:
+        raise ImportError("--compile needs the optional 'py-solc-x' package (pip install py-solc-x)")
+    solcx.install_solc(solc_version)  # downloaded once, then cached
+    source = CONTRACTS_DIR / f"{contract_name}.sol"
+    compiled = solcx.compile_files([str(source)], output_values=["abi", "bin"], solc_version=solc_version)
+    output = next(v for k, v in compiled.items() if k.endswith(f":{contract_name}"))
+    return {"abi": output["abi"], "bytecode": "0x" + output["bin"], "source": read_source(contract_name)}
+
+
+def load_artifact(artifact_path: str, contract_name: str) -> Dict:
+    """Read a truffle build artifact, refusing one built from other source than contracts/."""
+    with open(artifact_path, encoding="utf-8") as f:
+        artifact = json.load(f)
+    if artifact.get("source") != read_source(contract_name):
+        raise ValueError(f"{artifact_path} was not compiled from contracts/{contract_name}.sol; "
+                         "run `truffle compile` or pass --compile")
+    return artifact
+
+
+def deploy(w3, artifact: Dict, account: str):
+    factory = w3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"])
+    receipt = w3.eth.wait_for_transaction_receipt(factory.constructor().transact({"from": account}))
+    return w3.eth.contract(address=receipt["contractAddress"], abi=artifact["abi"]), receipt["gasUsed"]
+
+
+def measure(w3, contract, account: str, count: int) -> Dict:
+    store_gas = []
+    for i in range(count):
+        cert_id = f"CERT{i + 1:03d}"
+        cert_hash = Web3.keccak(text=cert_id)
+        tx_hash = contract.functions.storeCertificate(
+            cert_id, cert_hash, f"Participant Number {i + 1}", "Blockchain Workshop 2025", "2025-09-12"
+        ).transact({"from": account})
+        store_gas.append(w3.eth.wait_for_transaction_receipt(tx_hash)["gasUsed"])
+
+    tx_hash = contract.functions.storeBatchRoot("BATCH-001", Web3.keccak(text="root"), count).transact(
+        {"from": account})
+    batch_gas = w3.eth.wait_for_transaction_receipt(tx_hash)["gasUsed"]
+    return {"store_mean": statistics.mean(store_gas), "store_max": max(store_gas), "batch_root": batch_gas}
+
+
+# ----------------------------
+# Main
+# ----------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare gas used by CertificateStorage v1 and v2")
+    parser.add_argument("--count", type=int, default=20, help="certificates to store in each contract")
+    parser.add_argument("--v1-artifact", default=CONTRACT_ARTIFACT)
+    parser.add_argument("--v2-artifact", default=CONTRACT_V2_ARTIFACT)
+    parser.add_argument("--compile", action="store_true",
+                        help="compile contracts/*.sol with py-solc-x instead of reading build artifacts")
+    args = parser.parse_args()
+
+    w3 = get_web3()
+    account = os.getenv("ACCOUNT_ADDRESS") or w3.eth.accounts[0]
+
+    results = {}
+    if args.compile:
+        artifacts = (("v1", compile_artifact("CertificateStorage")),
+                     ("v2", compile_artifact("CertificateStorageV2")))
+    else:
+        artifacts = (("v1", load_artifact(args.v1_artifact, "CertificateStorage")),
+                     ("v2", load_artifact(args.v2_artifact, "CertificateStorageV2")))
+    for label, artifact in artifacts:
+        contract, deploy_gas = deploy(w3, artifact, account)
+        results[label] = {"deploy": deploy_gas, **measure(w3, contract, account, args.count)}
+        logging.info(f"{label}: bytecode {Web3.keccak(hexstr=artifact['bytecode']).hex()[:18]}, "
+                     f"{args.count} certificates on chain {w3.eth.chain_id}")
+
+    print(f"{'':<22}{'v1':>12}{'v2':>12}{'v1/v2':>8}")
+    for key, title in (("store_mean", "storeCertificate avg"), ("store_max", "storeCertificate max"),
+                       ("batch_root", "storeBatchRoot"), ("deploy", "deployment")):
+        v1, v2 = results["v1"][key], results["v2"][key]
+        print(f"{title:<22}{v1:>12,.0f}{v2:>12,.0f}{v1 / v2:>8.2f}")
@@ -0,0 +1,75 @@
+import hashlib
+from typing import List, Union
+
+# ----------------------------
+# Merkle tree over certificate hashes
+# ----------------------------
+# Leaves and internal nodes are domain-separated so an internal node can never
+# be passed off as a certificate hash. Sibling pairs are hashed in sorted order,
+# which means a proof is just the list of sibling hashes - no left/right flags.
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+HashLike = Union[str, bytes]
+
+
+def to_bytes(value: HashLike) -> bytes:
+    """Accept a 32-byte digest as raw bytes or hex (with or without 0x)."""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def leaf_hash(cert_hash: HashLike) -> bytes:
+    """Hash a certificate's SHA-256 digest into a tree leaf."""
+    return hashlib.sha256(LEAF_PREFIX + to_bytes(cert_hash)).digest()
+
+
+def node_hash(a: bytes, b: bytes) -> bytes:
+    """Hash two sibling nodes into their parent."""
+    if b < a:
+        a, b = b, a
+    return hashlib.sha256(NODE_PREFIX + a + b).digest()
+
+
+def build_tree(cert_hashes: List[HashLike]) -> List[List[bytes]]:
+    """
+    Build every level of the tree, leaves first and the root level last.
+    An odd node at the end of a level is carried up unchanged.
+    """
+    if not cert_hashes:
+        raise ValueError("Cannot build a Merkle tree from an empty batch")
+
+    levels = [[leaf_hash(h) for h in cert_hashes]]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def get_root(levels: List[List[bytes]]) -> str:
+    """Return the tree root as a 0x-prefixed hex string."""
+    return "0x" + levels[-1][0].hex()
+
+
+def get_proof(levels: List[List[bytes]], index: int) -> List[str]:
+    """Return the sibling hashes needed to walk leaf ``index`` up to the root."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append("0x" + level[sibling].hex())
+        index //= 2
+    return proof
+
+
+def verify_proof(cert_hash: HashLike, proof: List[HashLike], root: HashLike) -> bool:
+    """Check that ``cert_hash`` is included under ``root``."""
+    node = leaf_hash(cert_hash)
+    for sibling in proof:
+        node = node_hash(node, to_bytes(sibling))
+    return node == to_bytes(root)
+
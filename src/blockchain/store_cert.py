@@ -1,13 +1,18 @@
-import hashlib
 import json
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from web3 import Web3
-from web3.exceptions import ContractLogicError, TransactionNotFound
+from web3.exceptions import ContractLogicError, TimeExhausted, TransactionNotFound
+
+from client import get_web3, get_write_contract
+from hashing import file_hash
+from merkle import build_tree, get_proof, get_root, to_bytes
+from verify_cert import get_batch_root, is_anchored, lookup_hashes
 
 # ----------------------------
 # Setup
@@ -16,56 +21,68 @@ logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
 load_dotenv()
 
-RPC_URL = os.getenv("RPC_URL", "http://127.0.0.1:7545")
-CONTRACT_ADDRESS = os.getenv("CONTRACT_ADDRESS")
+CONTRACT_ADDRESS = os.getenv("CONTRACT_V2_ADDRESS") or os.getenv("CONTRACT_ADDRESS")
 ACCOUNT = os.getenv("ACCOUNT_ADDRESS")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 
 if not all([CONTRACT_ADDRESS, ACCOUNT, PRIVATE_KEY]):
     raise EnvironmentError("Missing CONTRACT_ADDRESS, ACCOUNT_ADDRESS or PRIVATE_KEY in .env")
 
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
-if not w3.is_connected():
-    raise ConnectionError(f"Failed to connect to blockchain at {RPC_URL}")
-
-# Load contract ABI
-with open("build/contracts/CertificateStorage.json", encoding="utf-8") as f:
-    contract_data = json.load(f)
-
-contract = w3.eth.contract(address=Web3.to_checksum_address(CONTRACT_ADDRESS),
-                           abi=contract_data["abi"])
+# The node connection and ABI come from the shared client on first use, so
+# importing this module (e.g. from cert_gen with --skip-anchor) needs no node.
+# Writes go to CertificateStorageV2 when CONTRACT_V2_ADDRESS is set; both
+# versions take the same storeCertificate/storeBatchRoot arguments. v2 cannot
+# see IDs anchored to the original contract, so every write first looks the
+# ID up in both and skips (same hash) or refuses (different hash) known ones.
+GAS_LIMIT = 2_000_000
+GAS_PRICE = Web3.to_wei("20", "gwei")
+# Replacement transactions must outbid the original by at least 10% on most nodes
+GAS_PRICE_BUMP = 1.125
 
 
 # ----------------------------
 # Helpers
 # ----------------------------
-def generate_hash(file_path: Path) -> str:
-    """Generate SHA-256 hash for a file."""
-    sha256 = hashlib.sha256()
-    with file_path.open("rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):  # read in chunks
-            sha256.update(chunk)
-    return sha256.hexdigest()
+def _sign_store_tx(cert_id: str, cert_hash: str, name: str, event: str, date: str,
+                   nonce: int, gas_price: int, chain_id: Optional[int] = None):
+    """Build and sign a storeCertificate transaction for an explicit nonce."""
+    w3, contract = get_web3(), get_write_contract()
+    params = {
+        "from": ACCOUNT,
+        "nonce": nonce,
+        "gas": GAS_LIMIT,
+        "gasPrice": gas_price,
+    }
+    if chain_id is not None:
+        params["chainId"] = chain_id
+    tx = contract.functions.storeCertificate(
+        cert_id,
+        f"0x{cert_hash}",
+        name,
+        event,
+        date
+    ).build_transaction(params)
+    return w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
 
 
-def store_certificate(cert_id: str, file_path: Path, name: str, event: str, date: str) -> str:
-    """Store a certificate hash on the blockchain and return the hash."""
+def store_certificate(cert_id: str, file_path: Path, name: str, event: str, date: str,
+                      cert_hash: Optional[str] = None) -> str:
+    """
+    Store a certificate hash on the blockchain and return the hash.
+    ``cert_hash`` (e.g. a canonical content hash) skips hashing ``file_path``.
+    """
     try:
-        cert_hash = generate_hash(file_path)
-        tx = contract.functions.storeCertificate(
-            cert_id,
-            f"0x{cert_hash}",
-            name,
-            event,
-            date
-        ).build_transaction({
-            "from": ACCOUNT,
-            "nonce": w3.eth.get_transaction_count(ACCOUNT),
-            "gas": 2_000_000,
-            "gasPrice": w3.to_wei("20", "gwei"),
-        })
-
-        signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+        w3 = get_web3()
+        cert_hash = cert_hash.removeprefix("0x") if cert_hash else file_hash(file_path).removeprefix("0x")
+        anchored = lookup_hashes([cert_id])[cert_id]
+        if anchored is not None:
+            if to_bytes(anchored) == to_bytes(cert_hash):
+                logging.info(f"⏭️ {cert_id} already anchored | Hash: 0x{cert_hash}")
+                return cert_hash
+            logging.error(f"Blockchain error for {cert_id}: Certificate ID already anchored with a different hash")
+            return ""
+        signed_tx = _sign_store_tx(cert_id, cert_hash, name, event, date,
+                                   w3.eth.get_transaction_count(ACCOUNT), GAS_PRICE)
         tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
         receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
 
@@ -80,6 +97,261 @@ def store_certificate(cert_id: str, file_path: Path, name: str, event: str, date
     return ""
 
 
+def _hashes_for(certificates: List[Dict], max_workers: Optional[int] = None) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Use each item's precomputed ``hash`` if given, otherwise hash its
+    ``file_path``. Returns a (hash, error) pair per item, so one missing or
+    unreadable file doesn't abort the rest of the batch.
+    """
+    def _hash(cert: Dict) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            if cert.get("hash"):
+                return cert["hash"].removeprefix("0x"), None
+            return file_hash(Path(cert["file_path"])).removeprefix("0x"), None
+        except Exception as e:
+            logging.error(f"Could not hash {cert.get('cert_id')}: {e}")
+            return None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_hash, certificates))
+
+
+def _await_receipt(entry: Dict, chain_id: int, timeout: int, max_retries: int) -> Dict:
+    """Wait for a submitted transaction, re-broadcasting it if it was dropped."""
+    w3 = get_web3()
+    gas_price = entry["gas_price"]
+    for attempt in range(max_retries + 1):
+        try:
+            receipt = w3.eth.wait_for_transaction_receipt(entry["tx_hash"], timeout=timeout)
+        except TimeExhausted:
+            receipt = None
+
+        if receipt is not None:
+            entry["block_number"] = receipt["blockNumber"]
+            if receipt["status"] == 1:
+                entry["status"] = "confirmed"
+                entry["error"] = None
+            else:
+                entry["status"] = "failed"
+                entry["error"] = "Transaction reverted"
+            return entry
+
+        # Our nonce has been mined by some other transaction (replaced): the
+        # certificate is only safe if that transaction stored the same hash.
+        if w3.eth.get_transaction_count(ACCOUNT) > entry["nonce"]:
+            if is_anchored(entry["cert_id"], entry["hash"]):
+                entry["status"] = "confirmed"
+                entry["error"] = None
+            else:
+                entry["status"] = "failed"
+                entry["error"] = "Transaction replaced"
+            return entry
+
+        if attempt == max_retries:
+            break
+
+        # Still pending or dropped from the mempool: re-broadcast with the same
+        # nonce and a bumped gas price so it replaces any stuck copy.
+        gas_price = int(gas_price * GAS_PRICE_BUMP)
+        try:
+            signed_tx = _sign_store_tx(entry["cert_id"], entry["hash"], entry["name"],
+                                       entry["event"], entry["date"], entry["nonce"],
+                                       gas_price, chain_id)
+            entry["tx_hash"] = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            entry["gas_price"] = gas_price
+            entry["retries"] += 1
+            logging.warning(f"🔁 Re-broadcast {entry['cert_id']} (nonce {entry['nonce']}) "
+                            f"| TxHash: {entry['tx_hash'].hex()}")
+        except Exception as e:
+            # Usually "nonce too low": the original got mined in the meantime,
+            # so loop round and pick up its receipt or the replacement check.
+            logging.warning(f"Re-broadcast of {entry['cert_id']} rejected: {e}")
+
+    entry["status"] = "failed"
+    entry["error"] = f"No receipt after {max_retries} retries"
+    return entry
+
+
+def store_certificates_batch(certificates: List[Dict], max_workers: int = 16,
+                             receipt_timeout: int = 120, max_retries: int = 3,
+                             on_submit: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """
+    Anchor many certificates with locally managed nonces.
+
+    Each item needs ``cert_id``, ``name``, ``event``, ``date`` and either a
+    precomputed ``hash`` or a ``file_path`` to hash. All transactions are
+    signed and submitted back-to-back before any receipt is awaited, then
+    receipts are collected concurrently. Returns one result per certificate
+    (in input order) with ``status`` set to ``confirmed`` or ``failed``, plus
+    ``hash``, ``tx_hash``, ``nonce``, ``block_number`` and ``error``. IDs
+    already anchored in either contract version are not sent again: they come
+    back confirmed (same hash, no ``tx_hash``) or failed (different hash).
+
+    ``on_submit(entry)`` is called with each signed transaction's ``nonce``
+    and ``tx_hash`` just before it is broadcast, so a caller can persist it
+    and tell after a crash whether the transaction may have been sent.
+    """
+    if not certificates:
+        return []
+
+    hashes = _hashes_for(certificates, max_workers)
+    onchain = lookup_hashes([cert["cert_id"] for cert in certificates])
+
+    w3 = get_web3()
+    chain_id = w3.eth.chain_id
+    nonce = w3.eth.get_transaction_count(ACCOUNT, "pending")
+    results: List[Dict] = []
+    submitted: List[Dict] = []
+
+    for cert, (cert_hash, hash_error) in zip(certificates, hashes):
+        entry = {
+            "cert_id": cert["cert_id"],
+            "name": cert["name"],
+            "event": cert["event"],
+            "date": cert["date"],
+            "hash": cert_hash,
+            "nonce": None,
+            "tx_hash": None,
+            "gas_price": GAS_PRICE,
+            "block_number": None,
+            "retries": 0,
+            "status": "failed",
+            "error": hash_error,
+        }
+        results.append(entry)
+        if cert_hash is None:
+            continue
+        anchored = onchain[cert["cert_id"]]
+        if anchored is not None:
+            if to_bytes(anchored) == to_bytes(cert_hash):
+                entry["status"] = "confirmed"
+                logging.info(f"⏭️ {cert['cert_id']} already anchored | Hash: 0x{cert_hash}")
+            else:
+                entry["error"] = "Certificate ID already anchored with a different hash"
+            continue
+        try:
+            signed_tx = _sign_store_tx(cert["cert_id"], cert_hash, cert["name"], cert["event"],
+                                       cert["date"], nonce, GAS_PRICE, chain_id)
+            if on_submit is not None:
+                on_submit({**entry, "nonce": nonce, "tx_hash": Web3.to_hex(signed_tx.hash)})
+            entry["tx_hash"] = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            # The nonce was not consumed, so hand it to the next certificate
+            # instead of leaving a gap that would stall every later transaction.
+            entry["error"] = str(e)
+            logging.error(f"Failed to submit {cert['cert_id']}: {e}")
+            continue
+        entry["nonce"] = nonce
+        entry["status"] = "submitted"
+        submitted.append(entry)
+        nonce += 1
+
+    logging.info(f"📤 Submitted {len(submitted)}/{len(certificates)} transactions, awaiting receipts...")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda e: _await_receipt(e, chain_id, receipt_timeout, max_retries), submitted))
+
+    for entry in results:
+        if entry["tx_hash"] is not None:
+            entry["tx_hash"] = Web3.to_hex(entry["tx_hash"])
+        if entry["status"] != "confirmed":
+            logging.error(f"Blockchain error for {entry['cert_id']}: {entry['error']}")
+        elif entry["tx_hash"] is not None:
+            logging.info(f"✅ Stored {entry['cert_id']} | TxHash: {entry['tx_hash']} | Hash: 0x{entry['hash']}")
+        del entry["gas_price"]
+
+    return results
+
+
+def proof_path_for(file_path: Path) -> Path:
+    """Location of the inclusion proof stored next to a batch-anchored certificate."""
+    return file_path.with_suffix(".proof.json")
+
+
+def anchor_batch_root(batch_id: str, certificates: List[Dict]) -> Dict:
+    """
+    Anchor a whole cohort with a single transaction holding its Merkle root.
+
+    Each item needs ``cert_id``, ``file_path``, ``name``, ``event`` and ``date``,
+    plus an optional precomputed ``hash``. An inclusion proof is written next
+    to every certificate file (see :func:`proof_path_for`) and also returned
+    under ``proofs`` keyed by cert_id.
+    """
+    result = {"batch_id": batch_id, "root": None, "tx_hash": None,
+              "status": "failed", "error": None, "proofs": {}}
+    if not certificates:
+        result["error"] = "Empty batch"
+        return result
+
+    try:
+        w3, contract = get_web3(), get_write_contract()
+        hashed = _hashes_for(certificates)
+        # Every leaf is needed to build the tree, so nothing is anchored if one is missing
+        unhashed = [cert["cert_id"] for cert, (_, error) in zip(certificates, hashed) if error]
+        if unhashed:
+            result["error"] = f"Could not hash {len(unhashed)} certificate(s): {', '.join(unhashed)}"
+            logging.error(f"Batch {batch_id} not anchored: {result['error']}")
+            return result
+        hashes = [cert_hash for cert_hash, _ in hashed]
+
+        levels = build_tree(hashes)
+        root = get_root(levels)
+        result["root"] = root
+
+        # Batch IDs share one namespace across both contract versions too
+        anchored_root = get_batch_root(batch_id)
+        if any(anchored_root) and anchored_root != to_bytes(root):
+            result["error"] = "Batch ID already anchored with a different root"
+            logging.error(f"Blockchain error for batch {batch_id}: {result['error']}")
+            return result
+        if any(anchored_root):
+            logging.info(f"⏭️ Batch {batch_id} already anchored | Root: {root}")
+        else:
+            tx = contract.functions.storeBatchRoot(batch_id, root, len(certificates)).build_transaction({
+                "from": ACCOUNT,
+                "nonce": w3.eth.get_transaction_count(ACCOUNT),
+                "gas": GAS_LIMIT,
+                "gasPrice": GAS_PRICE,
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+            result["tx_hash"] = Web3.to_hex(tx_hash)
+            if receipt["status"] != 1:
+                result["error"] = "Transaction reverted"
+                logging.error(f"Blockchain error for batch {batch_id}: transaction reverted")
+                return result
+
+    except (ContractLogicError, TransactionNotFound) as e:
+        result["error"] = str(e)
+        logging.error(f"Blockchain error for batch {batch_id}: {e}")
+        return result
+    except Exception as e:
+        result["error"] = str(e)
+        logging.error(f"Unexpected error anchoring batch {batch_id}: {e}")
+        return result
+
+    for index, (cert, cert_hash) in enumerate(zip(certificates, hashes)):
+        proof = {
+            "cert_id": cert["cert_id"],
+            "batch_id": batch_id,
+            "name": cert["name"],
+            "event": cert["event"],
+            "date": cert["date"],
+            "hash": f"0x{cert_hash}",
+            "root": root,
+            "proof": get_proof(levels, index),
+        }
+        with proof_path_for(Path(cert["file_path"])).open("w", encoding="utf-8") as f:
+            json.dump(proof, f, indent=2)
+        result["proofs"][cert["cert_id"]] = proof
+
+    result["status"] = "confirmed"
+    logging.info(f"✅ Stored batch {batch_id} ({len(certificates)} certificates) "
+                 f"| TxHash: {result['tx_hash']} | Root: {root}")
+    return result
+
+
 # ----------------------------
 # Main
 # ----------------------------
@@ -92,9 +364,14 @@ if __name__ == "__main__":
         # add more here...
     ]
 
+    batch = []
     for p in participants:
         file_path = certificate_folder / p["file"]
         if file_path.exists():
-            store_certificate(p["cert_id"], file_path, p["name"], p["event"], p["date"])
+            batch.append({**p, "file_path": file_path})
         else:
             logging.warning(f"⚠️ Certificate file {file_path} not found")
+
+    results = store_certificates_batch(batch)
+    confirmed = sum(1 for r in results if r["status"] == "confirmed")
+    logging.info(f"📊 Anchored {confirmed}/{len(results)} certificates")
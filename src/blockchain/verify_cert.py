@@ -1,50 +1,178 @@
-import hashlib
 import json
-import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Dict, List, Optional, Tuple
+
 from web3 import Web3
 
+import client
+from client import (CALL_ERRORS, cert_key, get_contract, get_contract_v2, get_details_many, get_reader,
+                    get_hashes_v2, verify_hashes, verify_hashes_v2)
+from hashing import certificate_hash, read_certificate
+from merkle import to_bytes, verify_proof
+
+
 # ----------------------------
-# Setup
+# Compatibility reader
 # ----------------------------
-load_dotenv()
+# Certificates live in CertificateStorageV2 (keyed by keccak256 of the ID,
+# metadata and issue time only in its event log) or, for older ones, in the original
+# CertificateStorage. Readers check v2 first and fall back to v1.
+def _log_metadata(log) -> Dict:
+    args = log["args"]
+    return {"name": args["name"], "event": args["eventName"], "date": args["date"],
+            "issued_at": args["issuedAt"]}
 
-w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
-assert w3.is_connected(), "Failed to connect to blockchain"
 
-with open("build/contracts/CertificateStorage.json", encoding="utf-8") as f:
-    contract_data = json.load(f)
+def _v2_metadata(contract, key: bytes) -> Dict:
+    logs = contract.events.CertificateStored.get_logs(
+        from_block=client.CONTRACT_V2_START_BLOCK, argument_filters={"certKey": key}
+    )
+    if not logs:
+        return {"name": None, "event": None, "date": None, "issued_at": None}
+    return _log_metadata(logs[0])
 
-contract = w3.eth.contract(
-    address=Web3.to_checksum_address(os.getenv("CONTRACT_ADDRESS")),
-    abi=contract_data["abi"]
-)
 
-# ----------------------------
-# Helpers
-# ----------------------------
-def generate_hash(file_path: Path) -> str:
-    """Generate SHA-256 hash for a certificate file."""
-    sha256 = hashlib.sha256()
-    with file_path.open("rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):  # read in chunks
-            sha256.update(chunk)
-    return "0x" + sha256.hexdigest()
+def lookup_metadata_v2(cert_ids: List[str]) -> Dict[str, Dict]:
+    """
+    name/event/date/issued_at of many v2 certificates, keyed by cert ID
+    (unknown IDs are omitted). The certKey topic is OR-matched, so this is
+    one log query per VIEW_BATCH_SIZE IDs rather than one per certificate.
+    """
+    v2 = get_contract_v2()
+    found: Dict[str, Dict] = {}
+    if v2 is None:
+        return found
+    keys = {cert_key(cert_id): cert_id for cert_id in dict.fromkeys(cert_ids)}
+    key_list = list(keys)
+    for i in range(0, len(key_list), client.VIEW_BATCH_SIZE):
+        logs = v2.events.CertificateStored.get_logs(
+            from_block=client.CONTRACT_V2_START_BLOCK,
+            argument_filters={"certKey": key_list[i:i + client.VIEW_BATCH_SIZE]},
+        )
+        for log in logs:
+            found.setdefault(keys[bytes(log["args"]["certKey"])], _log_metadata(log))
+    return found
+
+
+def lookup_certificate(cert_id: str, with_metadata: bool = True) -> Optional[Dict]:
+    """
+    On-chain record for ``cert_id`` from either contract version:
+    ``{"hash", "name", "event", "date", "version"}``, or None if unknown.
+    For v2 the metadata comes from the event log, skipped without ``with_metadata``.
+    """
+    v2 = get_contract_v2()
+    if v2 is not None:
+        key = cert_key(cert_id)
+        cert_hash = get_reader().call(v2.functions.getCertificate(key))
+        if any(cert_hash):
+            record = {"hash": Web3.to_hex(cert_hash), "version": 2}
+            record.update(_v2_metadata(v2, key) if with_metadata
+                          else {"name": None, "event": None, "date": None, "issued_at": None})
+            return record
+
+    if client.CONTRACT_ADDRESS:
+        details = get_reader().call(get_contract().functions.getCertificateDetails(cert_id))
+        if details[0]:
+            return {"hash": Web3.to_hex(details[3]), "version": 1,
+                    "name": details[0], "event": details[1], "date": details[2]}
+    return None
+
+
+def lookup_hashes(cert_ids: List[str]) -> Dict[str, Optional[str]]:
+    """Anchored hash (0x hex) for many cert IDs from either contract version; None if unknown."""
+    found: Dict[str, Optional[str]] = {cert_id: None for cert_id in cert_ids}
+    if cert_ids and get_contract_v2() is not None:
+        for cert_id, cert_hash in zip(cert_ids, get_hashes_v2(cert_ids)):
+            if any(cert_hash):
+                found[cert_id] = Web3.to_hex(cert_hash)
+    missing = [cert_id for cert_id in cert_ids if found[cert_id] is None]
+    if missing and client.CONTRACT_ADDRESS:
+        for cert_id, details in zip(missing, get_details_many(missing)):
+            if details[0]:
+                found[cert_id] = Web3.to_hex(details[3])
+    return found
+
+
+def is_anchored(cert_id: str, cert_hash: str) -> bool:
+    """Whether ``cert_hash`` is stored for ``cert_id`` in either contract version."""
+    cert_hash = "0x" + cert_hash.removeprefix("0x")
+    v2 = get_contract_v2()
+    if v2 is not None and v2.functions.verifyCertificate(cert_key(cert_id), cert_hash).call():
+        return True
+    return bool(client.CONTRACT_ADDRESS) and get_contract().functions.verifyCertificate(cert_id, cert_hash).call()
+
+
+# Batch roots are immutable once anchored, so each one is fetched only once.
+_batch_roots: Dict[str, bytes] = {}
+
+
+def get_batch_root(batch_id: str) -> bytes:
+    """Return the on-chain Merkle root for a batch (all zeros if unknown)."""
+    root = _batch_roots.get(batch_id)
+    if root is None:
+        v2 = get_contract_v2()
+        root = bytes(32)
+        if v2 is not None:
+            root = bytes(v2.functions.getBatchRoot(cert_key(batch_id)).call())
+        if not any(root) and client.CONTRACT_ADDRESS:
+            try:
+                root = bytes(get_contract().functions.getBatchRoot(batch_id).call())
+            except CALL_ERRORS:
+                pass  # CertificateStorage deployed before batch roots existed
+        if any(root):
+            _batch_roots[batch_id] = root
+    return root
 
 
-def verify_certificate(cert_id: str, file_path: Path) -> bool:
-    """Verify certificate by calculating its hash and checking on-chain."""
-    cert_hash = generate_hash(file_path)
-    is_valid = contract.functions.verifyCertificate(cert_id, cert_hash).call()
+def verify_batch_certificate(cert_id: str, file_path: Path, proof: Dict) -> bool:
+    """Verify a batch-anchored certificate offline against its batch root."""
+    cert_hash = certificate_hash(file_path)
+    is_valid = (
+        proof.get("cert_id") == cert_id
+        and to_bytes(proof["hash"]) == to_bytes(cert_hash)
+        and to_bytes(proof["root"]) == get_batch_root(proof["batch_id"])
+        and verify_proof(cert_hash, proof["proof"], proof["root"])
+    )
+
+    if is_valid:
+        print(
+            f"✅ Certificate {cert_id} is valid (batch {proof['batch_id']}).\n"
+            f"   Name: {proof['name']}\n"
+            f"   Event: {proof['event']}\n"
+            f"   Date: {proof['date']}"
+        )
+    else:
+        print(f"❌ Certificate {cert_id} is invalid (not included in batch {proof.get('batch_id')}).")
+
+    return is_valid
+
+
+def verify_certificate(cert_id: str, file_path: Path, proof_path: Optional[Path] = None) -> bool:
+    """
+    Verify certificate by calculating its hash and checking on-chain.
+    Certificates with an inclusion proof next to them (or at ``proof_path``)
+    are checked against their batch's Merkle root instead.
+    """
+    proof_path = proof_path or file_path.with_suffix(".proof.json")
+    if proof_path.exists():
+        with proof_path.open(encoding="utf-8") as f:
+            return verify_batch_certificate(cert_id, file_path, json.load(f))
+
+    record, cert_hash = read_certificate(file_path)
+    if record is not None and record["cert_id"] != cert_id:
+        print(f"❌ Certificate {cert_id} is invalid (file was issued as {record['cert_id']}).")
+        return False
+
+    onchain = lookup_certificate(cert_id)
+    is_valid = onchain is not None and to_bytes(onchain["hash"]) == to_bytes(cert_hash)
 
     if is_valid:
-        details = contract.functions.getCertificateDetails(cert_id).call()
         print(
             f"✅ Certificate {cert_id} is valid.\n"
-            f"   Name: {details[0]}\n"
-            f"   Event: {details[1]}\n"
-            f"   Date: {details[2]}"
+            f"   Name: {onchain['name']}\n"
+            f"   Event: {onchain['event']}\n"
+            f"   Date: {onchain['date']}"
         )
     else:
         print(f"❌ Certificate {cert_id} is invalid (hash mismatch).")
@@ -52,6 +180,54 @@ def verify_certificate(cert_id: str, file_path: Path) -> bool:
     return is_valid
 
 
+def verify_certificates(items: List[Tuple[str, Path]]) -> List[bool]:
+    """
+    Verify many (cert_id, file_path) pairs at once, without printing.
+    Files are hashed on a thread pool and checked on-chain with one
+    verifyCertificates call per few hundred files. Batch-anchored files go
+    through their proofs. Returns one result per item, in input order, so
+    several files claiming the same cert_id are each judged on their own.
+    """
+    def _inspect(item):
+        cert_id, file_path = item
+        if not file_path.exists():
+            return None
+        if file_path.with_suffix(".proof.json").exists():
+            return "proof"
+        record, cert_hash = read_certificate(file_path)
+        if record is not None and record["cert_id"] != cert_id:
+            return None
+        return cert_hash
+
+    with ThreadPoolExecutor() as pool:
+        hashes = list(pool.map(_inspect, items))
+
+    results = [False] * len(items)
+    on_chain = [index for index, h in enumerate(hashes) if h not in (None, "proof")]
+    # v2 first; whatever it does not hold may be an older v1 certificate
+    if get_contract_v2() is not None:
+        pairs = [(items[index][0], hashes[index]) for index in on_chain]
+        for index, valid in zip(on_chain, verify_hashes_v2(pairs)):
+            results[index] = valid
+        on_chain = [index for index in on_chain if not results[index]]
+    if on_chain and client.CONTRACT_ADDRESS:
+        pairs = [(items[index][0], hashes[index]) for index in on_chain]
+        for index, valid in zip(on_chain, verify_hashes(pairs)):
+            results[index] = valid
+
+    for index, ((cert_id, file_path), h) in enumerate(zip(items, hashes)):
+        if h == "proof":
+            with file_path.with_suffix(".proof.json").open(encoding="utf-8") as f:
+                proof = json.load(f)
+            results[index] = (
+                proof.get("cert_id") == cert_id
+                and to_bytes(proof["hash"]) == to_bytes(certificate_hash(file_path))
+                and to_bytes(proof["root"]) == get_batch_root(proof["batch_id"])
+                and verify_proof(proof["hash"], proof["proof"], proof["root"])
+            )
+    return results
+
+
 # ----------------------------
 # Main
 # ----------------------------
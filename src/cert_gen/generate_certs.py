@@ -1,18 +1,28 @@
+import argparse
+import json
+import multiprocessing
+import re
 import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
 import os
 
 import qrcode
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from pathlib import Path
+from urllib.parse import quote
 import sys
 sys.path.append(str(Path(__file__).resolve().parents[1] / 'blockchain'))
-from store_cert import store_certificate
+from store_cert import anchor_batch_root
+from anchor_queue import AnchorQueue, AnchorWorker
+from hashing import canonical_hash, canonical_record, stable_cert_id, stream_hash
+from indexer import CertificateIndex, INDEX_DB_PATH
 
 # Paths
 CSV_FILE = "src/cert_gen/participants.csv"
 TEMPLATE_FILE = "src/cert_gen/template.jpeg"   # your template
 OUTPUT_DIR = "src/cert_gen/output/"
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, "manifest.json")
 
 # Make sure output folder exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -22,12 +32,24 @@ FONT_NAME = ImageFont.truetype("arial.ttf", 25)
 FONT_EVENT = ImageFont.truetype("arial.ttf", 20)
 FONT_ACH = ImageFont.truetype("arial.ttf", 20)
 
-# Verification portal URL (replace with your actual URL)
-VERIFICATION_BASE_URL = "https://your-validation-portal.com/verify?hash="
+# Verification portal URL (replace with your actual URL). QR codes carry the
+# certificate ID: the anchored hash covers the finished PDF, QR included, so
+# it cannot appear in the QR itself
+VERIFICATION_BASE_URL = "https://your-validation-portal.com/verify?cert_id="
 
-def generate_certificate(cert_id, name, event, date, achievement):
-    # Open template
-    img = Image.open(TEMPLATE_FILE).convert("RGB")
+# Decoded template, loaded once per process and copied for every certificate
+_TEMPLATE = None
+
+
+def _get_template():
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        _TEMPLATE = Image.open(TEMPLATE_FILE).convert("RGB")
+    return _TEMPLATE
+
+
+def render_certificate(name, event, date, achievement):
+    img = _get_template().copy()
     draw = ImageDraw.Draw(img)
 
     # Draw text
@@ -35,17 +57,10 @@ def generate_certificate(cert_id, name, event, date, achievement):
     draw.text((279, 297), f"for {achievement}", font=FONT_ACH, fill="black")
     draw.text((282, 332), f"Event: {event}", font=FONT_EVENT, fill="black")
     draw.text((280, 386), f"Date: {date}", font=FONT_EVENT, fill="black")
+    return img
 
-    # Save certificate as PDF first
-    output_path = os.path.join(OUTPUT_DIR, f"{name.replace(' ', '_')}.pdf")
-    img.save(output_path, "PDF")
-
-    # Store hash on blockchain and get blockchain hash
-    blockchain_hash = store_certificate(cert_id, Path(output_path), name, event, date)
-    print(f"{name}'s blockchain hash: {blockchain_hash}")
 
-    # Generate QR code with blockchain hash link
-    verify_url = VERIFICATION_BASE_URL + blockchain_hash
+def add_qr_code(img, verify_url):
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_H,
@@ -62,21 +77,301 @@ def generate_certificate(cert_id, name, event, date, achievement):
     # Paste QR code onto certificate
     img.paste(qr_img, (img.width - 170, img.height - 170))  # bottom-right corner
 
-    # Save final certificate with QR code as PDF (overwrite)
-    img.save(output_path, "PDF")
-    print(f"Generated with QR: {output_path}")
 
-    # Save final certificate as PDF
-    output_path = os.path.join(OUTPUT_DIR, f"{name.replace(' ', '_')}.pdf")
-    img.save(output_path, "PDF")
-    print(f"Generated with QR: {output_path}")
+def output_path_for(job):
+    # The cert ID keeps participants who share a name from overwriting each
+    # other's PDF (and proof); CertID values from the CSV may hold anything
+    cert_id = re.sub(r"[^\w.-]", "_", job["cert_id"])
+    return os.path.join(OUTPUT_DIR, f"{job['name'].replace(' ', '_')}_{cert_id}.pdf")
+
+
+def job_content(job):
+    """Hash of a row's certificate content, to tell whether it must be rendered again."""
+    return canonical_hash(canonical_record(job["cert_id"], job["name"], job["event"],
+                                           job["date"], job["achievement"]))
+
+
+def generate_certificate(cert_id, name, event, date, achievement):
+    job = {"cert_id": cert_id, "name": name, "event": event, "date": date, "achievement": achievement}
+    rendered = _render_job(job)
+    print(f"Generated with QR: {rendered['file_path']}")
+
+    # Anchor through the queue, draining it here so the certificate is on-chain
+    # on return (this also sends anything else still queued)
+    queue = AnchorQueue()
+    queue.enqueue([rendered])
+    AnchorWorker(queue).drain()
+    status = queue.get(cert_id)["status"]
+    print(f"{name}'s hash anchoring {status}: {rendered['hash']}")
+    return rendered
+
+
+# ----------------------------
+# Rendering engine
+# ----------------------------
+# Jobs are plain dicts so they pickle cheaply to worker processes:
+# cert_id, name, event, date, achievement and, optionally, a qr_suffix
+# appended to the verification URL (the batch ID for batch certificates).
+def _render_job(job):
+    record = canonical_record(job["cert_id"], job["name"], job["event"], job["date"], job["achievement"])
+
+    img = render_certificate(job["name"], job["event"], job["date"], job["achievement"])
+    add_qr_code(img, VERIFICATION_BASE_URL + quote(job["cert_id"]) + job.get("qr_suffix", ""))
+
+    # Encode once in memory, then hash the bytes as they are written: the
+    # anchored hash is exactly the file that gets delivered. The PDF is left
+    # without timestamps, so re-rendering the same row reproduces the same
+    # bytes (and hash) instead of conflicting with what is already anchored
+    buffer = BytesIO()
+    img.save(buffer, "PDF", title=f"Certificate {job['cert_id']}", keywords=record,
+             creationDate=None, modDate=None)
+    buffer.seek(0)
+    output_path = output_path_for(job)
+    with open(output_path, "wb") as f:
+        cert_hash = stream_hash(buffer, f)
+    return {
+        "cert_id": job["cert_id"],
+        "name": job["name"],
+        "event": job["event"],
+        "date": job["date"],
+        "hash": cert_hash.removeprefix("0x"),
+        "content": canonical_hash(record),
+        "file_path": Path(output_path),
+    }
+
+
+def render_all(jobs, workers=None, chunksize=8):
+    """
+    Render certificates on a process pool, yielding each result (in input
+    order) as soon as its PDF has been written to disk. Workers are spawned,
+    not forked: this runs from a thread of the API process, next to the
+    anchor worker, and forking a threaded process can deadlock on held locks.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_get_template,
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        yield from pool.map(_render_job, jobs, chunksize=chunksize)
+
+
+# ----------------------------
+# Run manifest
+# ----------------------------
+# One entry per certificate ID: the content it was rendered from, the hash
+# of the PDF written for it (the one anchored), that file's size/mtime and,
+# for batch certificates, the batch. A row whose entry still matches is
+# neither rendered nor anchored again.
+MANIFEST_FLUSH_EVERY = 50
+
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    # Write-then-rename so an interrupted run never leaves a truncated manifest
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def manifest_entry(rendered):
+    stat = os.stat(rendered["file_path"])
+    return {"content": rendered["content"], "hash": rendered["hash"],
+            "file_path": str(rendered["file_path"]), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_current(entry, content):
+    """Whether a manifest entry was rendered from ``content`` and its PDF is untouched."""
+    if not entry or entry.get("content") != content:
+        return False
+    try:
+        stat = os.stat(entry["file_path"])
+    except OSError:
+        return False
+    return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+
+# ----------------------------
+# Participant rows
+# ----------------------------
+# A row's cert ID is its CertID column if the CSV has one, else derived from
+# its content plus the participant's Email; identical rows without an email
+# are told apart by which repeat they are. Rows issued before IDs were
+# derived keep their row-number ID (CERT001, ...) when the local event index
+# shows it was anchored for the same name, event and date.
+LEGACY_ID = re.compile(r"^CERT\d+$")
+
+
+def _cell(row, column):
+    value = row.get(column)
+    return "" if pd.isna(value) else str(value).strip()
+
+
+def load_jobs(csv_file=CSV_FILE, index=None):
+    """
+    Read participant rows as render jobs. With an event ``index``, rows
+    already issued under a legacy ID get that ID back and ``legacy`` set.
+    """
+    df = pd.read_csv(csv_file, dtype=str)
+    jobs, repeats = {}, {}
+    for position, row in df.iterrows():
+        fields = (row["Name"], row["Event"], row["Date"], row["Achievement"])
+        cert_id = _cell(row, "CertID")
+        if not cert_id:
+            person = _cell(row, "Email").lower()
+            if not person:
+                key = canonical_record("", *fields)
+                repeats[key] = repeats.get(key, 0) + 1
+                person = f"#{repeats[key]}" if repeats[key] > 1 else ""
+            cert_id = stable_cert_id(*fields, person=person)
+        if cert_id in jobs:
+            print(f"Skipping duplicate row for {row['Name']} ({row['Event']})")
+            continue
+        jobs[cert_id] = {"cert_id": cert_id, "name": row["Name"], "event": row["Event"],
+                         "date": row["Date"], "achievement": row["Achievement"], "row": position}
+
+    jobs = list(jobs.values())
+    if index is not None:
+        legacy_ids = find_legacy_ids(jobs, index)
+        for job in jobs:
+            if job["cert_id"] in legacy_ids:
+                job.update(cert_id=legacy_ids[job["cert_id"]], legacy=True)
+    return jobs
+
+
+def find_legacy_ids(jobs, index):
+    """
+    {cert_id: legacy ID} for rows anchored under the old row-number IDs:
+    the ID of the row's own position if it still matches, else an unclaimed
+    legacy ID anchored for the same name, event and date.
+    """
+    def same_person(indexed, job):
+        return (indexed["name"], indexed["event"], indexed["date"]) == (job["name"], job["event"], job["date"])
+
+    found, claimed = {}, set()
+    positional = index.get_many([f"CERT{job['row'] + 1:03d}" for job in jobs])
+    for job in jobs:
+        legacy_id = f"CERT{job['row'] + 1:03d}"
+        if legacy_id in positional and same_person(positional[legacy_id], job):
+            found[job["cert_id"]] = legacy_id
+            claimed.add(legacy_id)
+
+    # The CSV may have been reordered since: match the rest by content
+    for job in jobs:
+        if job["cert_id"] in found:
+            continue
+        for indexed in index.search(event=job["event"], date=job["date"], name=job["name"]):
+            legacy_id = indexed["cert_id"]
+            if LEGACY_ID.match(legacy_id) and legacy_id not in claimed and same_person(indexed, job):
+                found[job["cert_id"]] = legacy_id
+                claimed.add(legacy_id)
+                break
+    return found
+
+
+def split_current(jobs, manifest):
+    """Split jobs into those to render and (job, manifest entry) pairs already up to date."""
+    pending, done = [], []
+    for job in jobs:
+        entry = manifest.get(job["cert_id"])
+        if is_current(entry, job_content(job)):
+            done.append((job, entry))
+        else:
+            pending.append(job)
+    return pending, done
+
+
+def generate_batch(batch_id, jobs, workers=None, manifest=None):
+    """
+    Render a whole cohort once and anchor it with one Merkle-root transaction
+    over the finished PDFs' hashes. QR codes carry the cert and batch IDs;
+    each inclusion proof is written next to its PDF as a .proof.json. Once
+    the root is confirmed the certificates are recorded in ``manifest``.
+    """
+    if not jobs:
+        print(f"Batch {batch_id}: nothing to render")
+        return {"batch_id": batch_id, "root": None, "tx_hash": None,
+                "status": "skipped", "error": None, "proofs": {}}
+
+    for job in jobs:
+        job["qr_suffix"] = f"&batch={quote(batch_id)}"
+    rendered = []
+    for result in render_all(jobs, workers):
+        print(f"Generated with QR: {result['file_path']}")
+        rendered.append(result)
+
+    result = anchor_batch_root(batch_id, rendered)
+    print(f"Batch {batch_id} root: {result['root']} ({result['status']})")
+    if manifest is not None and result["status"] == "confirmed":
+        for certificate in rendered:
+            manifest[certificate["cert_id"]] = {**manifest_entry(certificate), "batch": batch_id}
+        save_manifest(manifest)
+    return result
+
+
+def run(batch_id=None, workers=None, skip_anchor=False):
+    """
+    Render every participant that is not up to date and anchor them.
+    Returns the anchor queue counts (or the batch result with ``batch_id``).
+    """
+    index = CertificateIndex(INDEX_DB_PATH) if os.path.exists(INDEX_DB_PATH) else None
+    jobs = load_jobs(index=index)
+    legacy = [job for job in jobs if job.get("legacy")]
+    if legacy:
+        print(f"{len(legacy)} certificates already issued under their original IDs")
+        jobs = [job for job in jobs if not job.get("legacy")]
+
+    manifest = load_manifest()
+    pending, done = split_current(jobs, manifest)
+    if batch_id:
+        print(f"{len(done)} certificates up to date, {len(pending)} to render")
+        return generate_batch(batch_id, pending, workers, manifest)
+
+    # Rows already rendered from the same content are only (re-)queued; the
+    # queue ignores cert IDs it already knows, so anchored ones stay untouched.
+    # Batch certificates are anchored through their batch root instead
+    queue = AnchorQueue()
+    requeued = queue.enqueue([{**job, "hash": entry["hash"], "file_path": entry["file_path"]}
+                              for job, entry in done if not entry.get("batch")])
+    print(f"{len(done)} certificates up to date ({requeued} re-queued for anchoring), "
+          f"{len(pending)} to render")
+
+    # Rendering never waits on the chain: each certificate is queued as soon
+    # as its PDF is written and the worker anchors in the background
+    worker = None if skip_anchor else AnchorWorker(queue)
+    if worker:
+        worker.start()
+    try:
+        for count, result in enumerate(render_all(pending, workers), 1):
+            print(f"Generated with QR: {result['file_path']}")
+            queue.enqueue([result])
+            manifest[result["cert_id"]] = manifest_entry(result)
+            if count % MANIFEST_FLUSH_EVERY == 0:
+                save_manifest(manifest)
+    finally:
+        save_manifest(manifest)
+        # Never leave the worker running in a long-lived API process: the
+        # next generation job would start another on the same nonces
+        if worker:
+            worker.finish()
+
+    counts = queue.counts()
+    print(f"Anchor queue: {counts}")
+    return counts
 
 
 def main():
-    df = pd.read_csv(CSV_FILE)
-    for idx, row in df.iterrows():
-        cert_id = f"CERT{idx+1:03d}"
-        generate_certificate(cert_id, row["Name"], row["Event"], row["Date"], row["Achievement"])
+    parser = argparse.ArgumentParser(description="Generate and anchor certificates")
+    parser.add_argument("--batch-id", help="anchor the rows not yet issued as one Merkle-root batch")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--skip-anchor", action="store_true",
+                        help="render and queue only; anchor later with anchor_queue.py")
+    args = parser.parse_args()
+    run(args.batch_id, args.workers, args.skip_anchor)
 
 if __name__ == "__main__":
     main()
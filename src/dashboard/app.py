@@ -1,9 +1,13 @@
 
 from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory
 import os
+import sys
+from pathlib import Path
 import pandas as pd
 from werkzeug.utils import secure_filename
-from utils import generate_qr_code, save_qr_to_file
+from utils import generate_qr_files
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'blockchain'))
+from indexer import CertificateIndex, INDEX_DB_PATH
 
 
 app = Flask(__name__)
@@ -20,6 +24,9 @@ certificates = []
 cert_issued = 0
 cert_validated = 0
 
+# On-chain counters come from the local event index when one has been built
+certificate_index = CertificateIndex(INDEX_DB_PATH) if os.path.exists(INDEX_DB_PATH) else None
+
 
 # Organizer login/logout
 @app.route("/", methods=["GET", "POST"])
@@ -45,7 +52,8 @@ def logout():
 def dashboard():
     if not session.get('logged_in'):
         return redirect(url_for('login'))
-    return render_template("dashboard.html", certificates=certificates, cert_issued=cert_issued, cert_validated=cert_validated)
+    issued = certificate_index.count() if certificate_index else cert_issued
+    return render_template("dashboard.html", certificates=certificates, cert_issued=issued, cert_validated=cert_validated)
 
 # CSV upload route
 @app.route("/upload_csv", methods=["POST"])
@@ -62,23 +70,20 @@ def upload_csv():
     # Process CSV
     df = pd.read_csv(filepath)
     global cert_issued
+    rows = []
     for idx, row in df.iterrows():
-        cert_id = f"CERT{len(certificates)+1:03d}"
-        name = row.get('Name')
-        event = row.get('Event')
-        date = row.get('Date')
-        achievement = row.get('Achievement', '')
-        # Generate QR code (simulate hash/URL)
+        cert_id = f"CERT{len(certificates)+len(rows)+1:03d}"
+        # QR code payload (simulate hash/URL)
         verify_url = f"https://your-validation-portal.com/verify?cert_id={cert_id}"
-        qr_img = generate_qr_code(verify_url)
-        qr_filename = f"{cert_id}.png"
-        qr_path = os.path.join(QR_FOLDER, qr_filename)
-        save_qr_to_file(qr_img, qr_path)
+        rows.append((cert_id, row, verify_url))
+    # Render every missing QR code in one batch; unchanged payloads are reused from disk
+    qr_filenames = generate_qr_files([verify_url for _, _, verify_url in rows], QR_FOLDER)
+    for (cert_id, row, _), qr_filename in zip(rows, qr_filenames):
         certificates.append({
             'id': cert_id,
-            'name': name,
-            'event': event,
-            'date': date,
+            'name': row.get('Name'),
+            'event': row.get('Event'),
+            'date': row.get('Date'),
             'qr_url': url_for('static', filename=f'qr/{qr_filename}')
         })
         cert_issued += 1
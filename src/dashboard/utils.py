@@ -1,31 +1,97 @@
 import qrcode
+from qrcode.util import MODE_8BIT_BYTE, QRData
+from PIL import Image
 from io import BytesIO
 import hashlib
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'blockchain'))
+from hashing import file_hash
+
+# QR codes are rendered with a fixed error correction level, border and mask.
+# Any mask pattern decodes; fixing one skips qrcode's search over all eight,
+# which is most of the encoding cost. The version (symbol size) only depends
+# on the payload length in byte mode, so it is worked out once per length.
+QR_ERROR_CORRECTION = qrcode.constants.ERROR_CORRECT_H
+QR_BORDER = 4
+QR_MASK_PATTERN = 0
+# Below this many missing codes a process pool costs more than it saves
+QR_POOL_THRESHOLD = 64
 
 def generate_certificate_hash(file_path):
     """
-    Generate SHA-256 hash of a certificate file (PDF/PNG).
+    Generate SHA-256 hash (0x-prefixed) of a certificate file (PDF/PNG).
     """
-    with open(file_path, "rb") as f:
-        data = f.read()
-    return hashlib.sha256(data).hexdigest()
+    return file_hash(Path(file_path))
+
+@lru_cache(maxsize=None)
+def _qr_version(length):
+    """Smallest QR version that holds ``length`` bytes."""
+    qr = qrcode.QRCode(error_correction=QR_ERROR_CORRECTION, border=QR_BORDER,
+                       mask_pattern=QR_MASK_PATTERN)
+    qr.add_data(QRData(b"\0" * length, mode=MODE_8BIT_BYTE))
+    return qr.best_fit()
 
 def generate_qr_code(data, size=150):
     """
     Generate a QR code image from the given data.
     Returns a PIL Image object.
     """
+    payload = data.encode("utf-8")
     qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-        box_size=10,
-        border=4,
+        version=_qr_version(len(payload)),
+        error_correction=QR_ERROR_CORRECTION,
+        border=QR_BORDER,
+        mask_pattern=QR_MASK_PATTERN,
     )
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-    img = img.resize((size, size))
-    return img
+    qr.add_data(QRData(payload, mode=MODE_8BIT_BYTE))
+    qr.make(fit=False)
+    # One pixel per module, scaled straight to the target size
+    matrix = qr.get_matrix()
+    modules = len(matrix)
+    img = Image.frombytes("L", (modules, modules),
+                          bytes(0 if dark else 255 for row in matrix for dark in row))
+    return img.resize((size, size), Image.NEAREST).convert("RGB")
+
+def qr_filename(data, size=150):
+    """Content-addressed PNG name, so identical payloads are only rendered once."""
+    return hashlib.sha256(f"{size}:{data}".encode("utf-8")).hexdigest()[:24] + ".png"
+
+def _render_qr_file(job):
+    data, size, file_path = job
+    buffer = BytesIO()
+    generate_qr_code(data, size).convert("L").save(buffer, "PNG")
+    # A unique temp file per write, so concurrent requests rendering the
+    # same code never share one
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_path), suffix=".tmp", delete=False) as f:
+        f.write(buffer.getbuffer())
+    os.replace(f.name, file_path)
+
+def generate_qr_files(payloads, folder, size=150, workers=None):
+    """
+    Make sure a QR code PNG exists in ``folder`` for every payload and return
+    their file names (in input order). Codes already on disk are reused;
+    large batches of missing ones are rendered on a process pool.
+    """
+    names = [qr_filename(data, size) for data in payloads]
+    missing = {}
+    for name, data in zip(names, payloads):
+        file_path = os.path.join(folder, name)
+        if file_path not in missing and not os.path.exists(file_path):
+            missing[file_path] = data
+    jobs = [(data, size, file_path) for file_path, data in missing.items()]
+
+    if len(jobs) < QR_POOL_THRESHOLD:
+        for job in jobs:
+            _render_qr_file(job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(_render_qr_file, jobs, chunksize=32))
+    return names
 
 def save_qr_to_file(img, file_path):
     """
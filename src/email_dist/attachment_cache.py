@@ -0,0 +1,105 @@
+import base64
+import os
+import threading
+from collections import OrderedDict
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+
+class EncodedAttachment:
+    """A MIME attachment part encoded once and reused for every recipient.
+
+    ``part`` is the complete part (headers and base64 body) padded with blank
+    lines to a multiple of 3 bytes, which means its base64url form can be
+    spliced into a larger base64url message without re-encoding it.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as attachment:
+            mime_part = MIMEBase('application', 'octet-stream')
+            mime_part.set_payload(attachment.read())
+
+        encoders.encode_base64(mime_part)
+        filename = os.path.basename(path)
+        mime_part.add_header(
+            'Content-Disposition',
+            f'attachment; filename= {filename}'
+        )
+
+        part = mime_part.as_bytes()
+        self.part = part + b"\n" * (-len(part) % 3)
+        self.encoded = base64.urlsafe_b64encode(self.part)
+
+    @property
+    def size(self) -> int:
+        return len(self.part) + len(self.encoded)
+
+
+class AttachmentCache:
+    """LRU cache of encoded attachments, bounded by total bytes held.
+
+    Entries are keyed by (path, mtime, size), so editing a file on disk
+    simply produces a new entry and the stale one ages out.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> EncodedAttachment:
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        # Encode outside the lock; a concurrent miss on the same file just
+        # encodes it twice and the last writer wins
+        entry = EncodedAttachment(path)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = entry
+                self.current_bytes += entry.size
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+        return entry
+
+
+def build_message(to_email: str, subject: str, body: str, headers: dict = None) -> tuple:
+    """Build the parts of a message that surround a pre-encoded attachment.
+
+    Returns ``(prefix, suffix)`` bytes: the full message is ``prefix +
+    attachment.part + suffix``, and ``prefix`` is padded to a multiple of 3
+    bytes so its base64 can be concatenated with ``attachment.encoded``.
+    ``headers`` adds extra top-level headers such as From or Message-ID.
+    """
+    message = MIMEMultipart()
+    message['to'] = to_email
+    message['subject'] = subject
+    for name, value in (headers or {}).items():
+        message[name] = value
+    message.attach(MIMEText(body, 'plain'))
+
+    generated = message.as_bytes()
+    boundary = message.get_boundary().encode()
+    closing = b"\n--" + boundary + b"--"
+    head = generated[:generated.rindex(closing)]
+    delimiter = b"\n--" + boundary + b"\n"
+
+    # Blank lines at the end of the text part are harmless padding
+    padding = b"\n" * (-(len(head) + len(delimiter)) % 3)
+    return head + padding + delimiter, closing + b"\n"
+
+
+def encode_raw(prefix: bytes, attachment: EncodedAttachment, suffix: bytes) -> str:
+    """base64url of ``prefix + attachment.part + suffix``, reusing the attachment's encoding"""
+    return (base64.urlsafe_b64encode(prefix) + attachment.encoded
+            + base64.urlsafe_b64encode(suffix)).decode()
@@ -1,6 +1,12 @@
 import csv
 import os
-from certificate_distributor import CertificateDistributor
+from itertools import islice
+from certificate_distributor import CertificateDistributor, default_email_content
+from database_operations import DatabaseManager
+
+NAME_COLUMNS = ('name',)
+EMAIL_COLUMNS = ('email', 'e-mail', 'email address')
+ORGANIZATION_COLUMNS = ('organization', 'organisation', 'org')
 
 def import_participants_from_csv(csv_path, certificate_path, certificate_type="Certificate"):
     """Import participants from CSV and add certificates to queue"""
@@ -88,13 +94,127 @@ def import_participants_from_csv(csv_path, certificate_path, certificate_type="C
     
     return imported_count > 0
 
+def _column_index(header, candidates):
+    """Position of the first header matching any candidate name (case-insensitive)"""
+    normalized = [h.strip().lower() for h in header]
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized.index(candidate)
+    return None
+
+def stream_import_participants_from_csv(csv_path, certificate_path, certificate_type="Certificate",
+                                        chunk_size=5000, db_manager=None):
+    """Import participants from CSV in chunks with bulk inserts.
+    
+    Unlike :func:`import_participants_from_csv` this never touches the email
+    service: rows are streamed, validated and deduplicated in memory, and each
+    chunk is written in a single transaction.
+    """
+    
+    db_manager = db_manager or DatabaseManager(persistent=True)
+    
+    # Verify certificate file exists (once - every row shares it)
+    if not os.path.exists(certificate_path):
+        print(f"❌ Certificate file not found: {certificate_path}")
+        return False
+    
+    # Verify CSV file exists
+    if not os.path.exists(csv_path):
+        print(f"❌ CSV file not found: {csv_path}")
+        return False
+    
+    print(f"📋 Streaming participants from: {csv_path}")
+    print(f"📄 Certificate file: {certificate_path}")
+    print(f"🎓 Certificate type: {certificate_type}")
+    print("=" * 50)
+    
+    imported_count = 0
+    failed_count = 0
+    duplicate_count = 0
+    seen_emails = set()
+    
+    try:
+        with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+            # Try to detect if the CSV has headers
+            sample = csvfile.read(1024)
+            csvfile.seek(0)
+            has_header = csv.Sniffer().has_header(sample)
+            
+            reader = csv.reader(csvfile)
+            
+            # Resolve column positions once instead of per row
+            name_col, email_col, org_col = 0, 1, 2
+            if has_header:
+                header = next(reader)
+                name_col = _column_index(header, NAME_COLUMNS)
+                email_col = _column_index(header, EMAIL_COLUMNS)
+                org_col = _column_index(header, ORGANIZATION_COLUMNS)
+                if name_col is None or email_col is None:
+                    print(f"❌ CSV header must contain name and email columns: {header}")
+                    return False
+            
+            row_num = 0
+            while True:
+                chunk = list(islice(reader, chunk_size))
+                if not chunk:
+                    break
+                
+                participants = []
+                for row in chunk:
+                    row_num += 1
+                    if len(row) <= max(name_col, email_col):
+                        print(f"❌ Row {row_num}: Insufficient columns")
+                        failed_count += 1
+                        continue
+                    
+                    name = row[name_col].strip()
+                    email = row[email_col].strip()
+                    organization = row[org_col].strip() if org_col is not None and len(row) > org_col else ''
+                    
+                    if not name or not email or '@' not in email:
+                        print(f"❌ Row {row_num}: Missing name or email")
+                        failed_count += 1
+                        continue
+                    
+                    email_key = email.lower()
+                    if email_key in seen_emails:
+                        duplicate_count += 1
+                        continue
+                    seen_emails.add(email_key)
+                    
+                    participants.append((name, email, organization or None, None))
+                
+                if not participants:
+                    continue
+                
+                ids = db_manager.add_participants_bulk(participants)
+                records = []
+                for name, email, _, _ in participants:
+                    subject, body = default_email_content(name, certificate_type)
+                    records.append((ids[email], certificate_type, certificate_path, subject, body))
+                imported_count += db_manager.add_certificate_records_bulk(records)
+                print(f"📦 Processed {row_num} rows ({imported_count} queued)")
+    
+    except Exception as e:
+        print(f"❌ Error reading CSV file: {str(e)}")
+        return False
+    
+    print("=" * 50)
+    print(f"📊 Import Summary:")
+    print(f"   ✅ Successfully imported: {imported_count}")
+    print(f"   🔁 Duplicate emails skipped: {duplicate_count}")
+    print(f"   ❌ Failed: {failed_count}")
+    print(f"   📧 Total certificates in queue: {imported_count}")
+    
+    return imported_count > 0
+
 if __name__ == "__main__":
     # Example usage
     csv_file = input("Enter CSV file path: ").strip()
     cert_file = input("Enter certificate file path: ").strip()
     cert_type = input("Enter certificate type (default: 'Certificate'): ").strip() or "Certificate"
     
-    success = import_participants_from_csv(csv_file, cert_file, cert_type)
+    success = stream_import_participants_from_csv(csv_file, cert_file, cert_type)
     
     if success:
         print("\n🎉 Import completed!")
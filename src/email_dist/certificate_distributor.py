@@ -1,12 +1,34 @@
-from email_service import EmailService
+from transports import get_transport
 from database_operations import DatabaseManager
+from dispatcher import CertificateDispatcher
 import os
+import socket
 from typing import Optional
 
+def default_email_content(name: str, certificate_type: str) -> tuple:
+    """Default (subject, body) for a queued certificate"""
+    subject = f"Your {certificate_type} Certificate"
+    body = f"""Dear {name},
+
+Congratulations! 🎉
+
+We are pleased to present you with your {certificate_type} certificate attached to this email.
+
+Thank you for your participation and dedication.
+
+Best regards,
+Certificate Team
+"""
+    return subject, body
+
 class CertificateDistributor:
-    def __init__(self):
-        self.email_service = EmailService()
-        self.db_manager = DatabaseManager()
+    def __init__(self, transport=None):
+        """``transport`` is a transport object or a name ('gmail', 'smtp');
+        by default the EMAIL_TRANSPORT env var picks one (see transports.py)."""
+        if transport is None or isinstance(transport, str):
+            transport = get_transport(transport)
+        self.email_service = transport
+        self.db_manager = DatabaseManager(persistent=True)
         print("🚀 Certificate Distributor initialized!")
     
     def add_certificate_to_queue(self, name: str, email: str, certificate_type: str, 
@@ -24,18 +46,9 @@ class CertificateDistributor:
             raise ValueError("Failed to add participant to the database.")
         
         # Create email content
-        subject = custom_subject or f"Your {certificate_type} Certificate"
-        body = custom_body or f"""Dear {name},
-
-Congratulations! 🎉
-
-We are pleased to present you with your {certificate_type} certificate attached to this email.
-
-Thank you for your participation and dedication.
-
-Best regards,
-Certificate Team
-"""
+        default_subject, default_body = default_email_content(name, certificate_type)
+        subject = custom_subject or default_subject
+        body = custom_body or default_body
         certificate_id: Optional[int] = self.db_manager.add_certificate_record(
             participant_id, certificate_type, pdf_path, subject, body
         )
@@ -45,37 +58,52 @@ Certificate Team
         print(f"📋 Certificate added to queue: {name} - {certificate_type}")
         return certificate_id
     
-    def send_single_certificate(self, certificate_id: int) -> bool:
+    def send_single_certificate(self, certificate_id: int, worker_id: Optional[str] = None) -> bool:
         """Send a specific certificate by ID"""
-        # Get certificate details
-        pending_certs = self.db_manager.get_pending_certificates()
-        cert = next((c for c in pending_certs if c['certificate_id'] == certificate_id), None)
+        # Lease the row first, so a concurrent send_all_pending cannot send it
+        # too; the lease gets its own worker ID so releasing it leaves any
+        # batch claims held by this process alone
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{certificate_id}"
+        cert = self.db_manager.claim_certificate(certificate_id, worker_id)
         
         if not cert:
-            print(f"❌ Certificate ID {certificate_id} not found or already sent")
+            print(f"❌ Certificate ID {certificate_id} not found, already sent or being sent")
             return False
         
-        return self._send_certificate(cert)
+        try:
+            return self._send_certificate(cert)
+        finally:
+            self.db_manager.release_claims(worker_id)
     
-    def send_all_pending(self) -> dict:
-        """Send all pending certificates"""
-        pending_certificates = self.db_manager.get_pending_certificates()
+    def send_all_pending(self, workers: int = 8, batch_size: int = 100,
+                         worker_id: Optional[str] = None, **dispatcher_options) -> dict:
+        """Drain the pending queue concurrently.
         
-        if not pending_certificates:
-            print("ℹ️  No pending certificates to send")
-            return {'total': 0, 'sent': 0, 'failed': 0}
-        
-        print(f"📬 Found {len(pending_certificates)} pending certificates")
+        Certificates are leased in batches of ``batch_size``, so several
+        sender processes can run this at once without double-sending.
+        """
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        dispatcher = CertificateDispatcher(self.email_service, self.db_manager,
+                                           workers=workers, **dispatcher_options)
+        results = {'total': 0, 'sent': 0, 'failed': 0}
         
-        results = {'total': len(pending_certificates), 'sent': 0, 'failed': 0}
+        try:
+            while True:
+                batch = self.db_manager.claim_batch(batch_size, worker_id)
+                if not batch:
+                    break
+                
+                print(f"📬 Claimed {len(batch)} pending certificates")
+                batch_results = dispatcher.dispatch(batch)
+                for key in results:
+                    results[key] += batch_results[key]
+        finally:
+            # Anything claimed but not finished goes straight back to the queue
+            self.db_manager.release_claims(worker_id)
         
-        for cert in pending_certificates:
-            print(f"\n📧 Processing: {cert['name']} ({cert['email']})")
-            
-            if self._send_certificate(cert):
-                results['sent'] += 1
-            else:
-                results['failed'] += 1
+        if not results['total']:
+            print("ℹ️  No pending certificates to send")
+            return results
         
         print(f"\n📊 Summary: {results['sent']} sent, {results['failed']} failed out of {results['total']} total")
         return results
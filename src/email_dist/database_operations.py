@@ -1,70 +1,168 @@
 import sqlite3
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 
+from database_setup import upgrade_schema
+
 class DatabaseManager:
-    def __init__(self, db_path='certificates.db'):
+    def __init__(self, db_path='certificates.db', persistent: bool = False):
+        """
+        By default every call opens and closes its own connection. With
+        ``persistent=True`` each thread keeps one long-lived connection in
+        WAL mode, which is what bulk imports and long sending runs want.
+        """
         self.db_path = db_path
+        self.persistent = persistent
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._schema_checked = False
     
-    def add_participant(self, name: str, email: str, organization: Optional[str] = None, phone: Optional[str] = None) -> Optional[int]:
-        """Add a participant to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _open(self) -> sqlite3.Connection:
+        # cached_statements keeps compiled statements around for reuse
+        conn = sqlite3.connect(self.db_path, cached_statements=256, check_same_thread=False)
+        if self.persistent:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        if not self._schema_checked:
+            # Databases created before the queue columns existed
+            upgrade_schema(conn)
+            self._schema_checked = True
+        return conn
+    
+    @contextmanager
+    def _connection(self):
+        """Yield a connection: a fresh one, or this thread's persistent one"""
+        if not self.persistent:
+            conn = self._open()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
         
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            with self._connections_lock:
+                self._connections.append(conn)
         try:
-            cursor.execute('''
-            INSERT INTO participants (name, email, organization, phone)
-            VALUES (?, ?, ?, ?)
-            ''', (name, email, organization, phone))
-            participant_id = cursor.lastrowid
-            conn.commit()
-            print(f"✅ Added participant: {name} ({email})")
-            return participant_id
-        except sqlite3.IntegrityError:
-            # Email already exists, get existing participant
-            cursor.execute('SELECT id FROM participants WHERE email = ?', (email,))
-            participant_id = cursor.fetchone()[0]
-            print(f"ℹ️  Participant already exists: {email}")
-            return participant_id
-        finally:
-            conn.close()
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def close(self):
+        """Close every persistent connection opened by this manager"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
+    def add_participant(self, name: str, email: str, organization: Optional[str] = None, phone: Optional[str] = None) -> Optional[int]:
+        """Add a participant to the database"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            try:
+                cursor.execute('''
+                INSERT INTO participants (name, email, organization, phone)
+                VALUES (?, ?, ?, ?)
+                ''', (name, email, organization, phone))
+                participant_id = cursor.lastrowid
+                conn.commit()
+                print(f"✅ Added participant: {name} ({email})")
+                return participant_id
+            except sqlite3.IntegrityError:
+                # Email already exists, get existing participant
+                conn.rollback()
+                cursor.execute('SELECT id FROM participants WHERE email = ?', (email,))
+                participant_id = cursor.fetchone()[0]
+                print(f"ℹ️  Participant already exists: {email}")
+                return participant_id
     
     def add_certificate_record(self, participant_id: int, certificate_type: str, 
                              pdf_path: str, subject: str = None, body: str = None) -> int:
         """Add a certificate record to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT INTO certificates (participant_id, certificate_type, pdf_path, email_subject, email_body)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (participant_id, certificate_type, pdf_path, subject, body))
-        
-        certificate_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+            INSERT INTO certificates (participant_id, certificate_type, pdf_path, email_subject, email_body)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (participant_id, certificate_type, pdf_path, subject, body))
+            
+            certificate_id = cursor.lastrowid
+            conn.commit()
         
         print(f"✅ Added certificate record ID: {certificate_id}")
         return certificate_id
     
-    def get_pending_certificates(self) -> List[Dict]:
-        """Get all pending certificates to be sent"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def add_participants_bulk(self, participants: List[tuple]) -> Dict[str, int]:
+        """Add many participants in one transaction.
+        
+        Each participant is a ``(name, email, organization, phone)`` tuple.
+        Existing emails are kept as they are. Returns ``{email: participant_id}``
+        for every email passed in.
+        """
+        emails = list(dict.fromkeys(p[1] for p in participants))
+        ids = {}
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
+            INSERT OR IGNORE INTO participants (name, email, organization, phone)
+            VALUES (?, ?, ?, ?)
+            ''', participants)
+            added = cursor.rowcount
+            
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(emails), 500):
+                chunk = emails[i:i + 500]
+                cursor.execute(
+                    f"SELECT email, id FROM participants WHERE email IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                ids.update(cursor.fetchall())
+            
+            conn.commit()
+        
+        print(f"✅ Added {added} participants ({len(emails) - added} already existed)")
+        return ids
+    
+    def add_certificate_records_bulk(self, records: List[tuple]) -> int:
+        """Add many certificate records in one transaction.
+        
+        Each record is a ``(participant_id, certificate_type, pdf_path,
+        subject, body)`` tuple. Returns the number of records added.
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
+            INSERT INTO certificates (participant_id, certificate_type, pdf_path, email_subject, email_body)
+            VALUES (?, ?, ?, ?, ?)
+            ''', records)
+            added = cursor.rowcount
+            
+            conn.commit()
         
-        cursor.execute('''
+        print(f"✅ Added {added} certificate records")
+        return added
+    
+    QUEUE_COLUMNS = '''
         SELECT c.id, p.name, p.email, p.organization, c.certificate_type, 
-               c.pdf_path, c.email_subject, c.email_body
+               c.pdf_path, c.email_subject, c.email_body, c.email_status
         FROM certificates c
         JOIN participants p ON c.participant_id = p.id
-        WHERE c.email_status = 'pending'
-        ORDER BY c.created_at
-        ''')
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        return [{
+    '''
+    
+    @staticmethod
+    def _queue_row(row) -> Dict:
+        return {
             'certificate_id': row[0],
             'name': row[1],
             'email': row[2],
@@ -72,74 +170,211 @@ class DatabaseManager:
             'certificate_type': row[4],
             'pdf_path': row[5],
             'email_subject': row[6],
-            'email_body': row[7]
-        } for row in results]
+            'email_body': row[7],
+            'email_status': row[8]
+        }
+    
+    def get_pending_certificates(self) -> List[Dict]:
+        """Get all pending certificates to be sent"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(self.QUEUE_COLUMNS + '''
+            WHERE c.email_status = 'pending'
+            ORDER BY c.created_at
+            ''')
+            
+            results = cursor.fetchall()
+        
+        return [self._queue_row(row) for row in results]
+    
+    def get_certificate(self, certificate_id: int) -> Optional[Dict]:
+        """Get one certificate by ID, whatever its status"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(self.QUEUE_COLUMNS + 'WHERE c.id = ?', (certificate_id,))
+            row = cursor.fetchone()
+        
+        return self._queue_row(row) if row else None
+    
+    def claim_batch(self, n: int, worker_id: str, lease_seconds: int = 600) -> List[Dict]:
+        """Atomically lease up to ``n`` pending certificates to ``worker_id``.
+        
+        Claimed rows move to ``sending`` so other workers skip them. Rows whose
+        lease has expired (a worker died mid-batch) can be claimed again.
+        """
+        now = datetime.now()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Take the write lock before reading so two workers cannot pick the same rows
+            if conn.in_transaction:
+                conn.commit()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('''
+                SELECT id FROM certificates
+                WHERE email_status = 'pending'
+                   OR (email_status = 'sending' AND lease_expires < ?)
+                ORDER BY created_at
+                LIMIT ?
+                ''', (now, n))
+                ids = [row[0] for row in cursor.fetchall()]
+                
+                cursor.executemany('''
+                UPDATE certificates
+                SET email_status = 'sending', claimed_by = ?, lease_expires = ?
+                WHERE id = ?
+                ''', [(worker_id, now + timedelta(seconds=lease_seconds), cert_id) for cert_id in ids])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            
+            if not ids:
+                return []
+            cursor.execute(
+                self.QUEUE_COLUMNS + f"WHERE c.id IN ({','.join('?' * len(ids))}) ORDER BY c.created_at",
+                ids
+            )
+            results = cursor.fetchall()
+        
+        return [self._queue_row(row) for row in results]
+    
+    def claim_certificate(self, certificate_id: int, worker_id: str, lease_seconds: int = 600) -> Optional[Dict]:
+        """Lease one certificate to ``worker_id`` like :meth:`claim_batch`.
+        
+        Returns the certificate, or None if it does not exist or is already
+        sent, failed or leased to another worker.
+        """
+        now = datetime.now()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            if conn.in_transaction:
+                conn.commit()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('''
+                UPDATE certificates
+                SET email_status = 'sending', claimed_by = ?, lease_expires = ?
+                WHERE id = ?
+                  AND (email_status = 'pending'
+                       OR (email_status = 'sending' AND lease_expires < ?))
+                ''', (worker_id, now + timedelta(seconds=lease_seconds), certificate_id, now))
+                claimed = cursor.rowcount == 1
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            
+            if not claimed:
+                return None
+            cursor.execute(self.QUEUE_COLUMNS + 'WHERE c.id = ?', (certificate_id,))
+            row = cursor.fetchone()
+        
+        return self._queue_row(row) if row else None
+    
+    def release_claims(self, worker_id: str):
+        """Return a worker's unfinished claims to the pending queue"""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+            UPDATE certificates
+            SET email_status = 'pending', claimed_by = NULL, lease_expires = NULL
+            WHERE email_status = 'sending' AND claimed_by = ?
+            ''', (worker_id,))
+            
+            conn.commit()
     
     def update_certificate_status(self, certificate_id: int, status: str, error_message: str = None):
         """Update certificate sending status"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            if status == 'sent':
+                cursor.execute('''
+                UPDATE certificates 
+                SET email_status = ?, sent_at = ?, error_message = NULL, claimed_by = NULL, lease_expires = NULL
+                WHERE id = ?
+                ''', (status, datetime.now(), certificate_id))
+            else:
+                cursor.execute('''
+                UPDATE certificates 
+                SET email_status = ?, error_message = ?, claimed_by = NULL, lease_expires = NULL
+                WHERE id = ?
+                ''', (status, error_message, certificate_id))
+            
+            conn.commit()
+    
+    def update_statuses_bulk(self, updates: List[tuple]):
+        """Update many certificate statuses in one transaction.
         
-        if status == 'sent':
-            cursor.execute('''
+        Each update is a ``(certificate_id, status, error_message)`` tuple.
+        """
+        now = datetime.now()
+        sent = [(now, cert_id) for cert_id, status, _ in updates if status == 'sent']
+        other = [(status, error, cert_id) for cert_id, status, error in updates if status != 'sent']
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
             UPDATE certificates 
-            SET email_status = ?, sent_at = ?, error_message = NULL
+            SET email_status = 'sent', sent_at = ?, error_message = NULL, claimed_by = NULL, lease_expires = NULL
             WHERE id = ?
-            ''', (status, datetime.now(), certificate_id))
-        else:
-            cursor.execute('''
+            ''', sent)
+            cursor.executemany('''
             UPDATE certificates 
-            SET email_status = ?, error_message = ?
+            SET email_status = ?, error_message = ?, claimed_by = NULL, lease_expires = NULL
             WHERE id = ?
-            ''', (status, error_message, certificate_id))
-        
-        conn.commit()
-        conn.close()
+            ''', other)
+            
+            conn.commit()
     
     def get_certificate_history(self, limit: int = 50) -> List[tuple]:
         """Get certificate sending history"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        SELECT p.name, p.email, c.certificate_type, c.email_status, 
-               c.sent_at, c.error_message
-        FROM certificates c
-        JOIN participants p ON c.participant_id = p.id
-        ORDER BY c.created_at DESC
-        LIMIT ?
-        ''', (limit,))
-        
-        results = cursor.fetchall()
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+            SELECT p.name, p.email, c.certificate_type, c.email_status, 
+                   c.sent_at, c.error_message
+            FROM certificates c
+            JOIN participants p ON c.participant_id = p.id
+            ORDER BY c.created_at DESC
+            LIMIT ?
+            ''', (limit,))
+            
+            results = cursor.fetchall()
         return results
     
     def get_statistics(self) -> Dict:
         """Get database statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total participants
-        cursor.execute('SELECT COUNT(*) FROM participants')
-        total_participants = cursor.fetchone()[0]
-        
-        # Total certificates
-        cursor.execute('SELECT COUNT(*) FROM certificates')
-        total_certificates = cursor.fetchone()[0]
-        
-        # Sent certificates
-        cursor.execute('SELECT COUNT(*) FROM certificates WHERE email_status = "sent"')
-        sent_certificates = cursor.fetchone()[0]
-        
-        # Pending certificates
-        cursor.execute('SELECT COUNT(*) FROM certificates WHERE email_status = "pending"')
-        pending_certificates = cursor.fetchone()[0]
-        
-        # Failed certificates
-        cursor.execute('SELECT COUNT(*) FROM certificates WHERE email_status LIKE "failed%"')
-        failed_certificates = cursor.fetchone()[0]
-        
-        conn.close()
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            
+            # Total participants
+            cursor.execute('SELECT COUNT(*) FROM participants')
+            total_participants = cursor.fetchone()[0]
+            
+            # Total certificates
+            cursor.execute('SELECT COUNT(*) FROM certificates')
+            total_certificates = cursor.fetchone()[0]
+            
+            # Sent certificates
+            cursor.execute('SELECT COUNT(*) FROM certificates WHERE email_status = "sent"')
+            sent_certificates = cursor.fetchone()[0]
+            
+            # Pending certificates
+            cursor.execute('SELECT COUNT(*) FROM certificates WHERE email_status = "pending"')
+            pending_certificates = cursor.fetchone()[0]
+            
+            # Failed certificates
+            cursor.execute('SELECT COUNT(*) FROM certificates WHERE email_status LIKE "failed%"')
+            failed_certificates = cursor.fetchone()[0]
         
         return {
             'total_participants': total_participants,
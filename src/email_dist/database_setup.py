@@ -2,6 +2,31 @@ import sqlite3
 from datetime import datetime
 import os
 
+def upgrade_schema(conn):
+    """Add the queue columns and indexes to an existing database (idempotent)"""
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'certificates'")
+    if cursor.fetchone() is None:
+        return
+    
+    # Lease columns used by DatabaseManager.claim_batch
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(certificates)')}
+    if 'claimed_by' not in columns:
+        cursor.execute('ALTER TABLE certificates ADD COLUMN claimed_by TEXT')
+    if 'lease_expires' not in columns:
+        cursor.execute('ALTER TABLE certificates ADD COLUMN lease_expires TIMESTAMP')
+    
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_certificates_status_created
+    ON certificates (email_status, created_at)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_certificates_participant
+    ON certificates (participant_id)
+    ''')
+    conn.commit()
+
 def create_database():
     """Create the SQLite database and tables"""
     
@@ -36,10 +61,14 @@ def create_database():
         email_status TEXT DEFAULT 'pending',
         error_message TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        claimed_by TEXT,
+        lease_expires TIMESTAMP,
         FOREIGN KEY (participant_id) REFERENCES participants (id)
     )
     ''')
     
+    upgrade_schema(conn)
+    
     # Create certificates folder if it doesn't exist
     if not os.path.exists('certificates'):
         os.makedirs('certificates')
@@ -0,0 +1,176 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+# Gmail API: 250 quota units per user per second, messages.send costs 100
+GMAIL_SENDS_PER_SECOND = 2.5
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TransientSendError(Exception):
+    """A send failure that is worth retrying after a backoff (rate limit, 5xx, network)"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def is_transient(error: Exception) -> bool:
+    """Decide whether a transport error should be retried"""
+    if isinstance(error, (TransientSendError, ConnectionError, TimeoutError)):
+        return True
+    # googleapiclient HttpError exposes the HTTP status on .resp
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'resp', None), 'status', None)
+    return status is not None and int(status) in RETRYABLE_STATUSES
+
+
+class RateLimiter:
+    """Token bucket shared by all workers sending through one account"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a send is allowed"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class CertificateDispatcher:
+    """Send certificates concurrently through any transport.
+
+    A transport is any object with ``send_message(to_email, subject, body,
+    attachment_path) -> message_id`` that raises on failure, such as
+    :class:`EmailService` or :class:`SMTPService`. Transient failures are retried with exponential
+    backoff and jitter; results are written to the database in batches.
+
+    With ``http_batch_size`` > 1 and a transport that also has ``send_batch``,
+    each worker sends groups of messages per HTTP round-trip instead.
+    """
+
+    def __init__(self, transport, db_manager, workers: int = 8,
+                 rate_per_second: Optional[float] = None, burst: int = 5,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 flush_every: int = 50, http_batch_size: int = 1):
+        self.transport = transport
+        self.http_batch_size = http_batch_size if hasattr(transport, 'send_batch') else 1
+        self.db_manager = db_manager
+        self.workers = workers
+        # Transports may declare their own limit; otherwise assume Gmail's quota
+        rate_per_second = rate_per_second or getattr(transport, 'rate_per_second', GMAIL_SENDS_PER_SECOND)
+        self.rate_limiter = RateLimiter(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.flush_every = flush_every
+
+    @staticmethod
+    def _email_content(cert: Dict) -> tuple:
+        subject = cert['email_subject'] or f"Your {cert['certificate_type']} Certificate"
+        body = cert['email_body'] or f"Dear {cert['name']},\n\nPlease find your certificate attached.\n\nBest regards,\nCertificate Team"
+        return subject, body
+
+    def _backoff(self, attempt: int):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _send_with_retry(self, cert: Dict) -> List[tuple]:
+        """Send one certificate; returns [(certificate_id, status, error_or_message_id)]"""
+        subject, body = self._email_content(cert)
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                message_id = self.transport.send_message(cert['email'], subject, body, cert['pdf_path'])
+                return [(cert['certificate_id'], 'sent', message_id)]
+            except Exception as e:
+                if not is_transient(e) or attempt == self.max_retries:
+                    return [(cert['certificate_id'], 'failed', f"Exception during send: {str(e)}")]
+                self._backoff(attempt)
+
+    def _send_batch_with_retry(self, certs: List[Dict]) -> List[tuple]:
+        """Send a group of certificates through ``transport.send_batch``.
+
+        Each message still costs one rate-limiter token; only the messages
+        that failed transiently are resent on the next attempt.
+        """
+        messages = {}
+        for cert in certs:
+            subject, body = self._email_content(cert)
+            messages[cert['certificate_id']] = {
+                'key': cert['certificate_id'], 'to_email': cert['email'],
+                'subject': subject, 'body': body, 'attachment_path': cert['pdf_path'],
+            }
+
+        results = []
+        for attempt in range(self.max_retries + 1):
+            for _ in messages:
+                self.rate_limiter.acquire()
+            try:
+                outcomes = self.transport.send_batch(list(messages.values()))
+            except Exception as e:
+                outcomes = {key: (None, e) for key in messages}
+
+            retry = {}
+            for key, message in messages.items():
+                message_id, error = outcomes.get(key, (None, TransientSendError('No response')))
+                if error is None:
+                    results.append((key, 'sent', message_id))
+                elif is_transient(error) and attempt < self.max_retries:
+                    retry[key] = message
+                else:
+                    results.append((key, 'failed', f"Exception during send: {str(error)}"))
+
+            messages = retry
+            if not messages:
+                break
+            self._backoff(attempt)
+        return results
+
+    def dispatch(self, certificates: List[Dict]) -> dict:
+        """Send all given certificates and return a summary"""
+        results = {'total': len(certificates), 'sent': 0, 'failed': 0}
+        by_id = {cert['certificate_id']: cert for cert in certificates}
+        updates = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            if self.http_batch_size > 1:
+                futures = [
+                    pool.submit(self._send_batch_with_retry, certificates[i:i + self.http_batch_size])
+                    for i in range(0, len(certificates), self.http_batch_size)
+                ]
+            else:
+                futures = [pool.submit(self._send_with_retry, cert) for cert in certificates]
+            for future in as_completed(futures):
+                for certificate_id, status, detail in future.result():
+                    cert = by_id[certificate_id]
+                    if status == 'sent':
+                        results['sent'] += 1
+                        updates.append((certificate_id, 'sent', None))
+                        print(f"✅ Sent to {cert['email']}")
+                    else:
+                        results['failed'] += 1
+                        updates.append((certificate_id, 'failed', detail))
+                        print(f"❌ Failed to send to {cert['email']}: {detail}")
+
+                if len(updates) >= self.flush_every:
+                    self.db_manager.update_statuses_bulk(updates)
+                    updates = []
+
+        if updates:
+            self.db_manager.update_statuses_bulk(updates)
+        return results
@@ -1,24 +1,38 @@
 import os
-import base64
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+import threading
+from io import BytesIO
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+
+from attachment_cache import AttachmentCache, build_message, encode_raw
 
 class EmailService:
     SCOPES = [
         'https://www.googleapis.com/auth/gmail.send',
         'https://www.googleapis.com/auth/gmail.readonly'
     ]
+    # Gmail recommends at most 50 requests per batch
+    BATCH_LIMIT = 50
+    # Messages above this size are sent as a resumable media upload instead of
+    # a base64 'raw' JSON body (which also cannot go in a batch request)
+    UPLOAD_THRESHOLD = 4 * 1024 * 1024
     
-    def __init__(self):
-        self.service = self.authenticate_gmail()
+    def __init__(self, attachment_cache: AttachmentCache = None, service=None):
+        """``service`` injects a prebuilt Gmail client (e.g. one built against a
+        local HTTP stub) and skips OAuth entirely."""
+        # Shared across sends so a cohort's common certificate is encoded once
+        self.attachment_cache = attachment_cache or AttachmentCache()
+        self.credentials = None
+        self.service = service or self.authenticate_gmail()
+        # googleapiclient services are not thread-safe, so worker threads
+        # each get their own client built from the same credentials
+        self._local = threading.local()
+        self._local.service = self.service
         print("✅ Gmail service authenticated successfully!")
     
     def authenticate_gmail(self):
@@ -46,52 +60,114 @@ class EmailService:
                 token.write(creds.to_json())
                 print("💾 Token saved to token.json")
         
+        self.credentials = creds
         return build('gmail', 'v1', credentials=creds)
+
+    def _thread_service(self):
+        """Gmail client for the calling thread"""
+        service = getattr(self._local, 'service', None)
+        if service is None and self.credentials is None:
+            # Injected client: nothing to rebuild it from
+            return self.service
+        if service is None:
+            service = build('gmail', 'v1', credentials=self.credentials)
+            self._local.service = service
+        return service
+    
+    def _prepare(self, to_email: str, subject: str, body: str, attachment_path: str) -> tuple:
+        if not os.path.exists(attachment_path):
+            raise FileNotFoundError(f"Attachment file not found: {attachment_path}")
+        
+        # The attachment part is read and encoded once per file, then spliced
+        # between this recipient's headers/body and the closing boundary
+        attachment = self.attachment_cache.get(attachment_path)
+        prefix, suffix = build_message(to_email, subject, body)
+        return prefix, attachment, suffix
     
     def create_message_with_attachment(self, to_email: str, subject: str, body: str, attachment_path: str):
         """Create email message with file attachment"""
-        message = MIMEMultipart()
-        message['to'] = to_email
-        message['subject'] = subject
+        prefix, attachment, suffix = self._prepare(to_email, subject, body, attachment_path)
+        return {'raw': encode_raw(prefix, attachment, suffix)}
+    
+    def _send_request(self, service, prefix: bytes, attachment, suffix: bytes):
+        """messages.send request: a base64 'raw' body, or a resumable upload for large messages"""
+        if len(attachment.part) > self.UPLOAD_THRESHOLD:
+            media = MediaIoBaseUpload(BytesIO(prefix + attachment.part + suffix),
+                                      mimetype='message/rfc822', resumable=True)
+            return service.users().messages().send(userId="me", body={}, media_body=media)
+        return service.users().messages().send(
+            userId="me", body={'raw': encode_raw(prefix, attachment, suffix)}
+        )
+    
+    def send_message(self, to_email: str, subject: str, body: str, attachment_path: str) -> str:
+        """Send email with attachment and return the message ID; errors are raised"""
+        service = self._thread_service()
+        prefix, attachment, suffix = self._prepare(to_email, subject, body, attachment_path)
+        return self._send_request(service, prefix, attachment, suffix).execute()['id']
+    
+    def send_batch(self, messages: list) -> dict:
+        """Send many messages with as few HTTP round-trips as possible.
+        
+        ``messages`` are dicts with ``key``, ``to_email``, ``subject``, ``body``
+        and ``attachment_path``. Small messages go out in Gmail batch requests
+        of up to BATCH_LIMIT; large ones are uploaded one by one, since batch
+        requests cannot carry media uploads. Returns ``{key: (message_id, error)}``
+        with exactly one of the two set. Errors are caught per message and per
+        batch request, so the outcomes of messages already sent are always
+        returned and only the rest carry an error.
+        """
+        service = self._thread_service()
+        results = {}
+        keys = {}
         
-        # Add email body
-        message.attach(MIMEText(body, 'plain'))
+        def callback(request_id, response, exception):
+            key = keys[request_id]
+            results[key] = (None, exception) if exception is not None else (response['id'], None)
         
-        # Add file attachment
-        if os.path.exists(attachment_path):
-            with open(attachment_path, "rb") as attachment:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment.read())
+        def execute(batch, batch_keys):
+            try:
+                batch.execute()
+            except Exception as e:
+                # Keys the batch reported on before failing keep their outcome
+                for key in batch_keys:
+                    results.setdefault(key, (None, e))
+        
+        batch, batch_keys = service.new_batch_http_request(callback=callback), []
+        for message in messages:
+            key = message['key']
+            try:
+                prefix, attachment, suffix = self._prepare(
+                    message['to_email'], message['subject'], message['body'], message['attachment_path']
+                )
+                request = self._send_request(service, prefix, attachment, suffix)
+                if len(attachment.part) > self.UPLOAD_THRESHOLD:
+                    results[key] = (request.execute()['id'], None)
+                    continue
+            except Exception as e:
+                results[key] = (None, e)
+                continue
             
-            encoders.encode_base64(part)
-            filename = os.path.basename(attachment_path)
-            part.add_header(
-                'Content-Disposition',
-                f'attachment; filename= {filename}'
-            )
-            message.attach(part)
-        else:
-            raise FileNotFoundError(f"Attachment file not found: {attachment_path}")
+            request_id = str(len(keys))
+            keys[request_id] = key
+            batch.add(request, callback=callback, request_id=request_id)
+            batch_keys.append(key)
+            if len(batch_keys) == self.BATCH_LIMIT:
+                execute(batch, batch_keys)
+                batch, batch_keys = service.new_batch_http_request(callback=callback), []
         
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        return {'raw': raw_message}
+        if batch_keys:
+            execute(batch, batch_keys)
+        return results
     
     def send_email(self, to_email: str, subject: str, body: str, attachment_path: str) -> tuple:
         """Send email with attachment"""
         try:
             print(f"📧 Sending email to: {to_email}")
             
-            # Create message
-            message = self.create_message_with_attachment(to_email, subject, body, attachment_path)
-            
-            # Send message
-            sent_message = self.service.users().messages().send(
-                userId="me", body=message
-            ).execute()
+            message_id = self.send_message(to_email, subject, body, attachment_path)
             
-            print(f"✅ Email sent successfully! Message ID: {sent_message['id']}")
-            return True, sent_message['id']
+            print(f"✅ Email sent successfully! Message ID: {message_id}")
+            return True, message_id
             
         except FileNotFoundError as e:
             error_msg = f"File not found: {str(e)}"
@@ -14,10 +14,10 @@ def main():
     # Initialize distributor
     distributor = CertificateDistributor()
     
-    # Test Gmail connection
+    # Test email connection
     success, result = distributor.email_service.test_connection()
     if not success:
-        print("❌ Gmail connection failed. Please check your credentials.")
+        print("❌ Email connection failed. Please check your credentials.")
         return
     
     while True:
@@ -0,0 +1,206 @@
+import os
+import queue
+import re
+import smtplib
+import ssl
+import threading
+from contextlib import contextmanager
+from email.utils import formatdate, make_msgid
+
+from attachment_cache import AttachmentCache, build_message
+from dispatcher import TransientSendError
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class SMTPConnectionPool:
+    """Pool of logged-in SMTP sessions shared by all sending threads.
+
+    Opening a session costs a TCP connect, EHLO, STARTTLS and AUTH, which is
+    several round-trips per message when done per send. Sessions are instead
+    kept open and reused, and recycled after ``max_messages`` since many
+    relays cap the number of messages per session.
+    """
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 starttls: bool = True, use_ssl: bool = False, size: int = 8,
+                 timeout: float = 30, max_messages: int = 500):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                    context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+        smtp.ehlo()
+        if self.username:
+            smtp.login(self.username, self.password or '')
+        smtp.sent_count = 0
+        return smtp
+
+    @staticmethod
+    def _discard(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a session; it is returned to the pool unless it broke."""
+        with self._slots:
+            try:
+                smtp = self._idle.get_nowait()
+            except queue.Empty:
+                smtp = self._connect()
+
+            try:
+                yield smtp
+            except (smtplib.SMTPServerDisconnected, OSError):
+                smtp.close()
+                raise
+            except Exception:
+                # The server answered, so the session is still usable
+                # once the failed transaction is reset
+                try:
+                    smtp.rset()
+                    self._idle.put(smtp)
+                except Exception:
+                    smtp.close()
+                raise
+
+            smtp.sent_count += 1
+            if smtp.sent_count >= self.max_messages:
+                self._discard(smtp)
+            else:
+                self._idle.put(smtp)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class SMTPService:
+    """Send certificates through an SMTP relay.
+
+    Implements the same transport interface as :class:`EmailService`
+    (``send_message``, ``send_email`` and ``test_connection``), so it can be
+    used anywhere the Gmail service is. Settings default to the ``SMTP_*``
+    environment variables.
+    """
+
+    def __init__(self, host: str = None, port: int = None, username: str = None,
+                 password: str = None, sender: str = None, starttls: bool = None,
+                 use_ssl: bool = None, pool_size: int = None, rate_per_second: float = None,
+                 attachment_cache: AttachmentCache = None):
+        use_ssl = _env_flag('SMTP_SSL', '0') if use_ssl is None else use_ssl
+        self.host = host or os.getenv('SMTP_HOST', 'localhost')
+        self.port = port or int(os.getenv('SMTP_PORT', '465' if use_ssl else '587'))
+        username = username or os.getenv('SMTP_USERNAME')
+        self.sender = sender or os.getenv('SMTP_FROM') or username
+        if not self.sender:
+            raise ValueError("No sender address: set SMTP_FROM or SMTP_USERNAME")
+        # Read by CertificateDispatcher in place of the Gmail quota
+        self.rate_per_second = rate_per_second or float(os.getenv('SMTP_RATE_PER_SECOND', '50'))
+        self.attachment_cache = attachment_cache or AttachmentCache()
+        self.pool = SMTPConnectionPool(
+            self.host, self.port, username,
+            password or os.getenv('SMTP_PASSWORD'),
+            starttls=_env_flag('SMTP_STARTTLS', '1') if starttls is None else starttls,
+            use_ssl=use_ssl,
+            size=pool_size or int(os.getenv('SMTP_POOL_SIZE', '8')),
+        )
+        print(f"✅ SMTP transport ready ({self.host}:{self.port})")
+
+    def send_message(self, to_email: str, subject: str, body: str, attachment_path: str) -> str:
+        """Send email with attachment and return its Message-ID; errors are raised"""
+        if not os.path.exists(attachment_path):
+            raise FileNotFoundError(f"Attachment file not found: {attachment_path}")
+
+        attachment = self.attachment_cache.get(attachment_path)
+        message_id = make_msgid()
+        prefix, suffix = build_message(to_email, subject, body, headers={
+            'From': self.sender,
+            'Date': formatdate(localtime=True),
+            'Message-ID': message_id,
+        })
+        # smtplib sends bytes as-is, so line endings must already be CRLF;
+        # lines that are already CRLF are left alone
+        data = re.sub(rb"\r?\n", b"\r\n", prefix + attachment.part + suffix)
+
+        # A pooled session may have been dropped by the server while idle;
+        # that is retried once on a fresh session before giving up
+        for attempt in range(2):
+            try:
+                with self.pool.connection() as smtp:
+                    smtp.sendmail(self.sender, [to_email], data)
+                return message_id
+            except smtplib.SMTPServerDisconnected as e:
+                if attempt:
+                    raise ConnectionError(f"SMTP server disconnected: {e}")
+            except smtplib.SMTPRecipientsRefused as e:
+                code, reply = e.recipients[to_email]
+                raise self._error(code, reply)
+            except smtplib.SMTPResponseException as e:
+                raise self._error(e.smtp_code, e.smtp_error)
+
+    @staticmethod
+    def _error(code: int, reply) -> Exception:
+        if isinstance(reply, bytes):
+            reply = reply.decode(errors='replace')
+        # 4xx replies are temporary (greylisting, throttling, mailbox busy)
+        if 400 <= code < 500:
+            return TransientSendError(f"SMTP {code}: {reply}", code)
+        return smtplib.SMTPException(f"SMTP {code}: {reply}")
+
+    def send_email(self, to_email: str, subject: str, body: str, attachment_path: str) -> tuple:
+        """Send email with attachment"""
+        try:
+            print(f"📧 Sending email to: {to_email}")
+
+            message_id = self.send_message(to_email, subject, body, attachment_path)
+
+            print(f"✅ Email sent successfully! Message ID: {message_id}")
+            return True, message_id
+
+        except FileNotFoundError as e:
+            error_msg = f"File not found: {str(e)}"
+            print(f"❌ {error_msg}")
+            return False, error_msg
+
+        except Exception as e:
+            error_msg = f"SMTP error: {str(e)}"
+            print(f"❌ {error_msg}")
+            return False, error_msg
+
+    def test_connection(self):
+        """Test SMTP connection and login"""
+        try:
+            with self.pool.connection() as smtp:
+                smtp.noop()
+            print(f"✅ SMTP connection successful!")
+            print(f"📧 Sending as: {self.sender} via {self.host}:{self.port}")
+            return True, self.sender
+        except Exception as e:
+            print(f"❌ SMTP connection failed: {str(e)}")
+            return False, str(e)
+
+    def close(self):
+        self.pool.close()
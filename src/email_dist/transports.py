@@ -0,0 +1,26 @@
+import os
+
+# ----------------------------
+# Email transports
+# ----------------------------
+# A transport is any object with:
+#   send_message(to_email, subject, body, attachment_path) -> message_id (raises on failure)
+#   send_email(to_email, subject, body, attachment_path) -> (success, message_id_or_error)
+#   test_connection() -> (success, account_or_error)
+# and optionally send_batch(messages) (see EmailService.send_batch) and a
+# rate_per_second attribute that overrides the dispatcher's Gmail quota.
+# Implementations are imported lazily so the SMTP path does not need the
+# Google client libraries installed.
+TRANSPORTS = ('gmail', 'smtp')
+
+
+def get_transport(name: str = None, **options):
+    """Create the transport named by ``name`` or the EMAIL_TRANSPORT env var (default: gmail)"""
+    name = (name or os.getenv('EMAIL_TRANSPORT', 'gmail')).strip().lower()
+    if name == 'gmail':
+        from email_service import EmailService
+        return EmailService(**options)
+    if name == 'smtp':
+        from smtp_service import SMTPService
+        return SMTPService(**options)
+    raise ValueError(f"Unknown email transport '{name}', expected one of: {', '.join(TRANSPORTS)}")
@@ -0,0 +1,207 @@
+import io
+import logging
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# ----------------------------
+# Background jobs
+# ----------------------------
+# Long-running actions (certificate generation, email distribution) run on a
+# thread pool inside the API process instead of blocking a request. Whatever
+# a job prints or logs from its own thread is captured line by line, so the
+# API can return a job ID at once and clients poll or stream the output.
+MAX_FINISHED_JOBS = 100
+
+_current = threading.local()
+
+
+class Job:
+    """State and captured output of one background job."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.lines: List[str] = []
+        self._partial = ""
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def write(self, text: str):
+        with self._changed:
+            text = self._partial + text
+            *complete, self._partial = text.split("\n")
+            self.lines.extend(line.rstrip("\r") for line in complete)
+            if complete:
+                self._changed.notify_all()
+
+    def _set_status(self, status: str, result=None, error: Optional[str] = None):
+        with self._changed:
+            if status == "running":
+                self.started_at = time.time()
+            else:
+                if self._partial:
+                    self.lines.append(self._partial)
+                    self._partial = ""
+                self.finished_at = time.time()
+            self.status, self.result, self.error = status, result, error
+            self._changed.notify_all()
+
+    def wait(self, since: int, timeout: float) -> bool:
+        """Block until there are lines past ``since`` or the job is done; False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: len(self.lines) > since or self.done, timeout)
+
+    def to_dict(self, since: int = 0) -> Dict:
+        with self._changed:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "lines": self.lines[since:],
+                "next": len(self.lines),
+            }
+
+
+class _JobOutput(io.TextIOBase):
+    """stdout replacement that copies writes from job threads into their job."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        job = getattr(_current, "job", None)
+        if job is not None:
+            job.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class _JobLogHandler(logging.Handler):
+    def emit(self, record):
+        job = getattr(_current, "job", None)
+        if job is not None:
+            job.write(self.format(record) + "\n")
+
+
+class JobRunner:
+    """
+    Runs callables on a worker pool and keeps their status and output.
+
+    Only output produced on the job's own thread is captured; threads the
+    job starts itself log to the server console as before.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._serial: Dict[str, ThreadPoolExecutor] = {}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        if not isinstance(sys.stdout, _JobOutput):
+            sys.stdout = _JobOutput(sys.stdout)
+            handler = _JobLogHandler()
+            handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+            logging.getLogger().addHandler(handler)
+
+    def _add(self, job: Job) -> Job:
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs once there are too many
+            finished = [j.id for j in self._jobs.values() if j.done]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self._jobs[job_id]
+        return job
+
+    def _run(self, job: Job, fn: Callable, args, kwargs):
+        _current.job = job
+        job._set_status("running")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logging.exception(f"Job {job.kind} failed")
+            job._set_status("failed", error=str(e))
+        else:
+            job._set_status("succeeded", result=result)
+        finally:
+            _current.job = None
+
+    def submit(self, kind: str, fn: Callable, *args, **kwargs) -> Job:
+        """Queue ``fn(*args, **kwargs)`` and return its job immediately."""
+        job = self._add(Job(kind))
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def submit_serial(self, kind: str, fn: Callable, *args, **kwargs) -> Job:
+        """
+        Like :meth:`submit`, but jobs of this ``kind`` run one at a time on
+        their own single worker thread. Queued ones wait there instead of
+        holding a pool worker that other jobs could use.
+        """
+        job = self._add(Job(kind))
+        with self._lock:
+            executor = self._serial.get(kind)
+            if executor is None:
+                executor = self._serial[kind] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"job-{kind}")
+        executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def start_process(self, kind: str, argv: List[str], cwd: Optional[str] = None) -> Job:
+        """
+        Launch a separate program (e.g. one of the Flask apps) and stream its
+        output into a job. It gets its own thread, not a pool worker, since
+        servers never exit. While a job of this ``kind`` is still running, that
+        job is returned instead of starting a second copy.
+        """
+        with self._lock:
+            for running in self._jobs.values():
+                if running.kind == kind and not running.done:
+                    return running
+        job = self._add(Job(kind))
+
+        def _follow():
+            job._set_status("running")
+            try:
+                proc = subprocess.Popen(argv, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        stdin=subprocess.DEVNULL, text=True, bufsize=1)
+            except OSError as e:
+                job._set_status("failed", error=str(e))
+                return
+            for line in proc.stdout:
+                job.write(line)
+            code = proc.wait()
+            if code == 0:
+                job._set_status("succeeded", result={"returncode": code})
+            else:
+                job._set_status("failed", result={"returncode": code}, error=f"Exited with status {code}")
+
+        threading.Thread(target=_follow, name=f"job-{kind}", daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
@@ -1,42 +1,207 @@
 
 from flask import Flask, render_template, request
-import os
 import json
+import os
+import re
+import sys
+import threading
+from io import BytesIO
 from pathlib import Path
-from dotenv import load_dotenv
-from web3 import Web3
+
+from certificate_cache import CertificateCache, CertificateEventListener
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'blockchain'))
+from client import get_contracts, get_web3
+from hashing import embedded_record, stream_hash
+from indexer import CertificateIndex, INDEX_DB_PATH
+from merkle import to_bytes, verify_proof
+from verify_cert import get_batch_root, lookup_certificate
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024
+
+# Blockchain setup: the shared client pools connections to the node, and
+# lookups from concurrent requests are coalesced into JSON-RPC batches.
+# Certificates may live in CertificateStorageV2 or the original contract.
+w3 = get_web3()
 
-# Blockchain setup (copied from verify_cert.py)
-load_dotenv()
-w3 = Web3(Web3.HTTPProvider(os.getenv("RPC_URL")))
-assert w3.is_connected(), "Failed to connect to blockchain"
-with open("build/contracts/CertificateStorage.json", encoding="utf-8") as f:
-    contract_data = json.load(f)
-contract = w3.eth.contract(
-    address=Web3.to_checksum_address(os.getenv("CONTRACT_ADDRESS")),
-    abi=contract_data["abi"]
+# Read-through cache of lookups, kept coherent by tailing CertificateStored events
+cache = CertificateCache(
+    maxsize=int(os.getenv("CERT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("CERT_CACHE_TTL", "3600")),
+    negative_ttl=float(os.getenv("CERT_CACHE_NEGATIVE_TTL", "30")),
 )
+event_listeners = [CertificateEventListener(w3, contract, cache) for contract in get_contracts()]
+for event_listener in event_listeners:
+    event_listener.start()
+
+# Hash-keyed index of CertificateStored events: resolves a QR's ?hash= (or an
+# uploaded file's hash) to its certificate in one read. It is kept in sync
+# here; a separately running `indexer.py --tail` on the same file also works.
+certificate_index = CertificateIndex(INDEX_DB_PATH)
+if os.getenv("CERT_INDEX_SYNC", "1") == "1":
+    threading.Thread(target=certificate_index.tail, args=(w3,), name="index-sync", daemon=True).start()
+
+HASH_PATTERN = re.compile(r"^(0x)?[0-9a-fA-F]{64}$")
+
 
 def check_certificate(cert_id):
     """Check certificate against blockchain."""
+    cached = cache.get(cert_id)
+    if cached is not None:
+        return cached
+
     try:
-        details = contract.functions.getCertificateDetails(cert_id).call()
-        # details: [name, event, date, hash]
-        if details[0]:
-            return {
+        record = lookup_certificate(cert_id)
+        if record is not None:
+            result = {
                 "valid": True,
-                "participant": details[0],
-                "event": details[1],
-                "date": details[2],
-                "hash": details[3]
+                "participant": record["name"],
+                "event": record["event"],
+                "date": record["date"],
+                "hash": record["hash"]
             }
+        else:
+            result = {"valid": False}
+        cache.put(cert_id, result)
+        return result
     except Exception as e:
+        # Transient RPC failures are not cached
         print(f"Blockchain error: {e}")
     return {"valid": False}
 
 
+def check_cert_id(cert_id):
+    """Look a certificate up by ID: the local index first, then the chain."""
+    try:
+        row = certificate_index.get(cert_id)
+    except Exception as e:
+        print(f"Index error: {e}")
+        row = None
+    return result_for(row) if row else check_certificate(cert_id)
+
+
+def batch_root(batch_id):
+    """A batch's anchored Merkle root from the index, else the chain (zero if unknown)."""
+    batch = certificate_index.get_batch(batch_id)
+    return to_bytes(batch["root"]) if batch else get_batch_root(batch_id)
+
+
+def check_batch(cert_id, batch_id):
+    """
+    Batch certificates are only anchored through their batch's Merkle root,
+    so a batch QR alone cannot prove anything: report whether the batch is
+    anchored and ask for the file itself.
+    """
+    try:
+        root = batch_root(batch_id)
+    except Exception as e:
+        print(f"Verification error: {e}")
+        root = bytes(32)
+    return {"valid": False, "batch": batch_id, "batch_anchored": any(root)}
+
+
+def result_for(row):
+    return {
+        "valid": True,
+        "participant": row["name"],
+        "event": row["event"],
+        "date": row["date"],
+        "hash": row["hash"],
+    }
+
+
+def check_hash(cert_hash):
+    """Resolve an individually anchored certificate's hash to (cert_id, result)."""
+    if not cert_hash or not HASH_PATTERN.match(cert_hash):
+        return None, {"valid": False}
+
+    try:
+        row = certificate_index.get_by_hash(cert_hash)
+    except Exception as e:
+        print(f"Verification error: {e}")
+        return None, {"valid": False}
+    if row is None:
+        return None, {"valid": False}
+    return row["cert_id"], result_for(row)
+
+
+def check_proof(file_digest, record, proof):
+    """
+    Verify a batch certificate: the file's hash must be a leaf of the
+    anchored root of the batch named in its .proof.json.
+    """
+    try:
+        root = batch_root(proof["batch_id"])
+        valid = (any(root) and to_bytes(proof["root"]) == root
+                 and verify_proof(file_digest, proof["proof"], root))
+    except Exception as e:
+        print(f"Verification error: {e}")
+        valid = False
+    if not valid:
+        return None, {"valid": False}
+    result = {"valid": True, "hash": file_digest}
+    if record is not None:
+        # The file itself is proven, so the record embedded in it can be trusted
+        result.update(participant=record["name"], event=record["event"], date=record["date"])
+    return (record or proof).get("cert_id"), result
+
+
+def check_upload(upload, proof_upload=None):
+    """
+    Verify an uploaded certificate file by the SHA-256 of its bytes, which is
+    what was anchored. The record embedded in the PDF only names the cert ID
+    to look up; batch certificates also need their .proof.json.
+    """
+    # Uploads are capped by MAX_CONTENT_LENGTH, so the file is read into memory
+    buffer = BytesIO()
+    file_digest = stream_hash(upload.stream, buffer)
+    buffer.seek(0)
+    record = embedded_record(buffer)
+
+    if proof_upload is not None:
+        try:
+            proof = json.load(proof_upload.stream)
+        except ValueError:
+            return None, {"valid": False}
+        return check_proof(file_digest, record, proof)
+
+    cert_id, result = check_hash(file_digest)
+    if result["valid"] or record is None:
+        return cert_id, result
+    # The index may lag the chain: fall back to a direct lookup by the embedded ID
+    cert_id = record["cert_id"]
+    result = check_certificate(cert_id)
+    if result["valid"] and to_bytes(result["hash"]) != to_bytes(file_digest):
+        result = {"valid": False}
+    return cert_id, result
+
+
+@app.route("/verify", methods=["GET", "POST"])
+def verify():
+    if request.method == "POST":
+        upload = request.files.get("certificate")
+        if upload is None or not upload.filename:
+            return render_template("index.html", error="Choose a certificate file to upload.")
+        proof_upload = request.files.get("proof")
+        if proof_upload is not None and not proof_upload.filename:
+            proof_upload = None
+        cert_id, result = check_upload(upload, proof_upload)
+        return render_template("result.html", cert_id=cert_id or upload.filename, result=result)
+
+    # Certificate QR codes link to ?cert_id=...; ?hash=... is kept for older codes
+    cert_id = request.args.get("cert_id", "").strip()
+    batch_id = request.args.get("batch", "").strip()
+    if cert_id and batch_id:
+        return render_template("result.html", cert_id=cert_id, result=check_batch(cert_id, batch_id))
+    if cert_id:
+        return render_template("result.html", cert_id=cert_id, result=check_cert_id(cert_id))
+
+    cert_hash = request.args.get("hash", "").strip()
+    cert_id, result = check_hash(cert_hash)
+    return render_template("result.html", cert_id=cert_id or cert_hash, result=result)
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from web3 import Web3
+
+
+class CertificateCache:
+    """
+    Thread-safe LRU cache of certificate lookups with per-entry expiry.
+
+    Certificates are immutable once stored, so positive entries can live for a
+    long time. Unknown IDs are cached too ("negative" entries) but with a short
+    TTL, and are replaced as soon as a CertificateStored event for that ID is seen.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 3600, negative_ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cert_id: str) -> Optional[dict]:
+        """Return the cached result for ``cert_id`` or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(cert_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[cert_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cert_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, cert_id: str, result: dict):
+        """Cache a lookup result; invalid results get the negative TTL."""
+        ttl = self.ttl if result.get("valid") else self.negative_ttl
+        with self._lock:
+            self._entries[cert_id] = (time.monotonic() + ttl, result)
+            self._entries.move_to_end(cert_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, cert_id: str):
+        with self._lock:
+            self._entries.pop(cert_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CertificateEventListener(threading.Thread):
+    """
+    Background thread that tails CertificateStored events and writes each new
+    certificate straight into the cache, overriding any negative entry.
+    """
+
+    def __init__(self, w3, contract, cache: CertificateCache, poll_interval: float = 2.0,
+                 from_block: Optional[int] = None):
+        super().__init__(daemon=True, name="certificate-event-listener")
+        self.w3 = w3
+        self.contract = contract
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.last_block = from_block - 1 if from_block is not None else None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def poll(self):
+        """Apply every CertificateStored event mined since the last poll."""
+        head = self.w3.eth.block_number
+        if self.last_block is None:
+            self.last_block = head
+            return
+        if head <= self.last_block:
+            return
+
+        events = self.contract.events.CertificateStored.get_logs(
+            from_block=self.last_block + 1, to_block=head
+        )
+        for event in events:
+            args = event["args"]
+            self.cache.put(args["certID"], {
+                "valid": True,
+                "participant": args["name"],
+                "event": args["eventName"],
+                "date": args["date"],
+                # Same 0x hex string a chain lookup caches
+                "hash": Web3.to_hex(args["hash"]),
+            })
+        self.last_block = head
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Event listener error: {e}")
+            self._stop_event.wait(self.poll_interval)
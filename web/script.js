@@ -7,17 +7,58 @@ function runAction(action) {
     };
     const endpoint = endpointMap[action];
     if (!endpoint) return;
-    document.getElementById('output').textContent = 'Running...';
+    const output = document.getElementById('output');
+    output.textContent = 'Starting...';
     fetch(endpoint, { method: 'POST' })
         .then(res => res.json())
         .then(data => {
-            if (data.success) {
-                document.getElementById('output').textContent = data.output || 'Action completed.';
-            } else {
-                document.getElementById('output').textContent = 'Error:\n' + (data.output || 'Unknown error');
+            if (!data.success) {
+                output.textContent = 'Error:\n' + (data.output || data.message || 'Unknown error');
+                return;
             }
+            followJob(data.events_url, output);
         })
         .catch(err => {
-            document.getElementById('output').textContent = 'Request failed: ' + err;
+            output.textContent = 'Request failed: ' + err;
+        });
+}
+
+// Stream a job's output lines as they are produced, then its final status
+function followJob(eventsUrl, output) {
+    output.textContent = '';
+    const events = new EventSource(eventsUrl);
+    events.addEventListener('log', e => {
+        output.textContent += JSON.parse(e.data) + '\n';
+        output.scrollTop = output.scrollHeight;
+    });
+    events.addEventListener('done', e => {
+        const job = JSON.parse(e.data);
+        output.textContent += job.status === 'succeeded'
+            ? 'Action completed.'
+            : 'Error: ' + (job.error || 'Unknown error');
+        events.close();
+    });
+}
+
+// GET so browsers and proxies can reuse cached results; several
+// comma-separated IDs are verified with one batch request
+function verifyCertificate() {
+    const output = document.getElementById('client-output');
+    const ids = document.getElementById('certIdInput').value.split(',').map(id => id.trim()).filter(Boolean);
+    if (!ids.length) return;
+    const url = ids.length === 1
+        ? '/api/verify?certId=' + encodeURIComponent(ids[0])
+        : '/api/verify/batch?certIds=' + ids.map(encodeURIComponent).join(',');
+    output.textContent = 'Verifying...';
+    fetch(url)
+        .then(res => res.json())
+        .then(data => {
+            const results = data.results || [{ certId: ids[0], valid: data.valid, certificate: data.certificate }];
+            output.textContent = results.map(r => r.valid
+                ? `✅ ${r.certId}: ${r.certificate.name} — ${r.certificate.event} (${r.certificate.date})`
+                : `❌ ${r.certId}: not found`).join('\n');
+        })
+        .catch(err => {
+            output.textContent = 'Request failed: ' + err;
         });
 }